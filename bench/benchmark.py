@@ -0,0 +1,302 @@
+"""Latency, memory and payload benchmark for the tracker callbacks.
+
+Generates synthetic sample sheets and CBTTC manifests with the columns
+the apps read, loads each app against them and drives its callbacks
+through a matrix of dropdown selections:
+
+    python bench/benchmark.py --rows 10000 100000 1000000
+    python bench/benchmark.py --apps cbttc-ngs --rows 10000000 --json out.json
+"""
+import argparse
+import gc
+import importlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+
+import dash
+import numpy as np
+import pandas as pd
+from plotly.utils import PlotlyJSONEncoder
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+milestones = ['Sample Shipped', 'Sample Sequenced', 'DRC Received',
+              'Available on Cavatica', 'Genomics Data Harmonized',
+              'Phenotype Data Harmonized']
+
+
+def get_weights(rng, n):
+    weights = 1.0 / np.arange(1, n + 1) ** 1.1
+    rng.shuffle(weights)
+    return weights / weights.sum()
+
+
+def generate_projects(rng, n_projects=80):
+    return pd.DataFrame({
+        'Title': ['Kids First Study {:03d}'.format(i)
+                  for i in range(n_projects)],
+        'Contact PI': ['PI {:02d}'.format(i)
+                       for i in rng.integers(0, 60, n_projects)],
+        'Institution Name': ['Institution {:02d}'.format(i)
+                             for i in rng.integers(0, 45, n_projects)],
+        'Year': rng.integers(2015, 2020, n_projects)})
+
+
+def generate_sample_sheet(rng, rows, df_project):
+    project = rng.choice(len(df_project), rows,
+                         p=get_weights(rng, len(df_project)))
+    df = df_project.iloc[project].reset_index(drop=True)
+    df.insert(0, 'Sample ID', ['SA_{:08d}'.format(i) for i in range(rows)])
+    df.insert(1, 'Participant ID',
+              ['PT_{:08d}'.format(i) for i in rng.integers(0, rows // 3 + 1,
+                                                           rows)])
+    done = np.ones(rows, dtype=bool)
+    # Milestones are a pipeline: a sample only reaches a step after the
+    # previous one.
+    for header, rate in zip(milestones, [.9, .85, .8, .75, .6, .7]):
+        done &= rng.random(rows) < rate
+        df[header] = done.astype(int)
+    return df
+
+
+def generate_manifest(rng, rows):
+    def pick(labels):
+        return np.asarray(labels)[rng.choice(
+            len(labels), rows, p=get_weights(rng, len(labels)))]
+    return pd.DataFrame({
+        'id': ['GF_{:09d}'.format(i) for i in range(rows)],
+        'file_name': ['{:09d}.bam'.format(i) for i in range(rows)],
+        'case_id': ['C{:08d}'.format(i)
+                    for i in rng.integers(0, rows // 12 + 1, rows)],
+        'sample_id': ['S{:08d}'.format(i)
+                      for i in rng.integers(0, rows // 4 + 1, rows)],
+        'experimental_strategy': pick(['WGS', 'WXS', 'RNA-Seq',
+                                       'Targeted Sequencing']),
+        'disease_type': pick(['Disease {:02d}'.format(i)
+                              for i in range(30)]),
+        'sample_type': pick(['Solid Tissue', 'Blood', 'Cell Line',
+                             'Saliva', 'Bone Marrow', 'Derived Cell Line']),
+        'gender': pick(['Male', 'Female', 'Not Reported']),
+        'ethnicity': pick(['Not Hispanic or Latino', 'Hispanic or Latino',
+                           'Not Reported']),
+        'race': pick(['White', 'Black or African American', 'Asian',
+                      'American Indian or Alaska Native',
+                      'Native Hawaiian or Other Pacific Islander',
+                      'More Than One Race', 'Not Reported']),
+        'file_size': rng.integers(10 ** 6, 10 ** 11, rows)})
+
+
+def write_data(data_dir, rows, seed):
+    rng = np.random.default_rng(seed)
+    df_project = generate_projects(rng)
+    df_project.to_csv(os.path.join(data_dir, 'project.csv'), index=False)
+    generate_sample_sheet(rng, rows, df_project).to_csv(
+        os.path.join(data_dir, 'sample-random.csv'), index=False)
+    generate_manifest(rng, rows).to_csv(
+        os.path.join(data_dir, '1519753644215-manifest.csv'), index=False)
+
+
+def load_app(name, rows):
+    spec = importlib.util.spec_from_file_location(
+        '{}_{}'.format(name.replace('-', '_'), rows),
+        os.path.join(root, name + '.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def get_scenarios(labels, row):
+    """Dropdown selections from none up to one value in every dropdown.
+
+    Single values are taken from one existing row so that combinations
+    across dropdowns still match something.
+    """
+    n = len(labels)
+    empty = [None] * n
+    first = [[i] for i in row]
+    return [
+        ('none', empty),
+        ('one', first[:1] + empty[1:]),
+        ('two-in-one', [labels[0][:2]] + empty[1:]),
+        ('two-dims', first[:2] + empty[2:]),
+        ('all-dims', first),
+        ('wide', [i[:len(i) // 2 or 1] for i in labels])]
+
+
+def get_args(dashboard, opts, query='', sort_by=(), days=91):
+    """Arguments of Dashboard.update: every input of its callback."""
+    args = list(opts) + [query] * len(dashboard.searched)
+    args += [3 if sort_by else 0, 25, list(sort_by), '']
+    if dashboard.trend:
+        args.append(days)
+    if dashboard.projects:
+        args += [0, 10, [{'column_id': 'Samples', 'direction': 'desc'}], '']
+    return args
+
+
+def get_calls(module, opts):
+    dashboard = module.dashboard
+    backend = dashboard.source.backend
+    selection = dashboard.get_selection(opts)
+    column = backend.columns[0]
+    client = module.server.test_client()
+    url = dashboard.get_export_url(opts)
+    changed = [dashboard.ids[0] + '.value']
+    sort_by = [{'column_id': column, 'direction': 'desc'}]
+
+    def export():
+        response = client.get(url, headers={'Accept-Encoding': 'identity'})
+        return response.get_data()
+
+    calls = [
+        ('select', lambda: backend.select(selection)),
+        ('update_dashboard', lambda: dashboard.update(
+            changed, *get_args(dashboard, opts))),
+        ('update_dashboard:table', lambda: dashboard.update(
+            ['table.page_current'], *get_args(dashboard, opts))),
+        ('update_dashboard:sorted', lambda: dashboard.update(
+            ['table.sort_by'], *get_args(dashboard, opts, sort_by=sort_by))),
+        ('export_csv', export)]
+    if dashboard.searched:
+        calls.insert(2, ('update_dashboard:search', lambda: dashboard.update(
+            [dashboard.searched[0] + '.search_value'],
+            *get_args(dashboard, opts, query='1'))))
+    if dashboard.trend:
+        calls.append(('update_dashboard:trend', lambda: dashboard.update(
+            ['trend-range.value'], *get_args(dashboard, opts, days=365))))
+    if dashboard.projects:
+        calls.append(('update_dashboard:projects', lambda: dashboard.update(
+            ['project-table.page_current'], *get_args(dashboard, opts))))
+    calls.append(('update_export', lambda: run_export(module, opts)))
+    return calls
+
+
+def call_export(module, prop_id, n, job_id, opts):
+    return module.dashboard.export([prop_id], n, n, job_id, *opts)
+
+
+def run_export(module, opts):
+    """Click the download button and poll the job until it is done.
+
+    The job's files are removed afterwards, or the next run would just
+    find the finished job.
+    """
+    result = call_export(module, 'export-button.n_clicks', 1, None, opts)
+    job_id = result[0]
+    while not result[1]:
+        time.sleep(0.005)
+        result = call_export(module, 'export-poll.n_intervals', 1, job_id,
+                             opts)
+    exports = module.engine.exports
+    for ext in ['csv.gz', 'json']:
+        if os.path.exists(exports.get_path(job_id, ext)):
+            os.remove(exports.get_path(job_id, ext))
+    return result
+
+
+def get_payload(result):
+    if isinstance(result, bytes):
+        return len(result)
+    if isinstance(result, pd.DataFrame):
+        return int(result.memory_usage(index=True).sum())
+    if isinstance(result, list):
+        # Dash leaves the outputs it does not update out of the response.
+        result = [i for i in result if i is not dash.no_update]
+    return len(json.dumps(result, cls=PlotlyJSONEncoder))
+
+
+def measure(module, call, repeat, warm):
+    times = []
+    for _ in range(repeat):
+        if not warm:
+            module.engine.result_cache.clear()
+        start = timeit.default_timer()
+        result = call()
+        times.append(timeit.default_timer() - start)
+    if not warm:
+        module.engine.result_cache.clear()
+    tracemalloc.start()
+    call()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return dict(p50_ms=np.percentile(times, 50) * 1000,
+                p95_ms=np.percentile(times, 95) * 1000,
+                peak_mb=peak / 1024.0 ** 2,
+                payload_kb=get_payload(result) / 1024.0)
+
+
+def run(apps, sizes, repeat, warm, seed):
+    from tracker.reload import Dataset
+    results = []
+    cwd = os.getcwd()
+    for rows in sizes:
+        work_dir = tempfile.mkdtemp(prefix='tracker-bench-')
+        try:
+            os.mkdir(os.path.join(work_dir, 'data'))
+            write_data(os.path.join(work_dir, 'data'), rows, seed)
+            os.symlink(os.path.join(root, 'static'),
+                       os.path.join(work_dir, 'static'))
+            os.chdir(work_dir)
+            os.environ['TRACKER_EXPORT_DIR'] = os.path.join(work_dir,
+                                                            'exports')
+            for name in apps:
+                start = timeit.default_timer()
+                module = load_app(name, rows)
+                load_s = timeit.default_timer() - start
+                print('{} {} rows loaded in {:.2f}s'.format(
+                    name, rows, load_s))
+                backend = module.dashboard.source.backend
+                headers = module.dashboard.headers
+                labels = [[i['value'] for i in backend.get_options(header)]
+                          for header in headers]
+                first = backend.get_page({}, 0, 1, [], '')[0][0]
+                row = [str(first[i]) for i in headers]
+                for scenario, opts in get_scenarios(labels, row):
+                    for call_name, call in get_calls(module, opts):
+                        row = dict(app=name, rows=rows, callback=call_name,
+                                   scenario=scenario)
+                        row.update(measure(module, call, repeat, warm))
+                        results.append(row)
+                        print('  {callback:28} {scenario:10} '
+                              'p50 {p50_ms:9.2f}ms  p95 {p95_ms:9.2f}ms  '
+                              'peak {peak_mb:8.2f}MB  '
+                              'payload {payload_kb:10.1f}KB'.format(**row))
+                # Datasets register themselves for the reload hooks; drop
+                # this app's, or every later run keeps its data alive.
+                del Dataset.instances[:]
+                module = None
+                gc.collect()
+        finally:
+            del Dataset.instances[:]
+            os.chdir(cwd)
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--apps', nargs='+',
+                        default=['kf-tracker', 'progress-bar', 'cbttc-ngs'])
+    parser.add_argument('--rows', nargs='+', type=int,
+                        default=[10000, 100000])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--warm', action='store_true',
+                        help='keep the result cache between repeats')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='also write the results here')
+    args = parser.parse_args(argv)
+    sys.path.insert(0, root)
+    results = run(args.apps, args.rows, args.repeat, args.warm, args.seed)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+# Production settings, e.g.:
+#
+#     gunicorn -c gunicorn.conf.py kf-tracker:server
+#
+# The app is imported once in the master (preload_app), so the loaded
+# frames and indexes are shared copy-on-write by every forked worker
+# instead of each worker parsing and holding its own copy.
+#
+# Workers do not watch the data. The master notices changed files, sends
+# itself a HUP, reloads the data once in on_reload and forks fresh
+# workers from it, while the old ones finish their requests and exit.
+import gc
+import logging
+import multiprocessing
+import os
+import signal
+import tempfile
+
+from tracker import metrics
+from tracker.reload import Dataset, watch_changes
+
+bind = os.environ.get('TRACKER_BIND', '0.0.0.0:8080')
+workers = int(os.environ.get(
+    'TRACKER_WORKERS', multiprocessing.cpu_count() + 1))
+threads = int(os.environ.get('TRACKER_THREADS', 4))
+worker_class = 'gthread'
+preload_app = True
+
+# Recycle workers gracefully so memory they have privately dirtied since
+# the fork (caches, result entries) is handed back periodically.
+max_requests = int(os.environ.get('TRACKER_MAX_REQUESTS', 2000))
+max_requests_jitter = max_requests // 10
+graceful_timeout = 30
+timeout = 120
+
+# Workers share their metrics through this directory, so a scrape of any
+# of them reports the numbers of all (see tracker/metrics.py).
+metrics_dir = os.environ.setdefault('TRACKER_METRICS_DIR', os.path.join(
+    tempfile.gettempdir(), 'tracker-metrics-{}'.format(os.getpid())))
+
+
+def freeze():
+    # Keep the collector from touching, and so copying, the preloaded
+    # objects in every worker.
+    if hasattr(gc, 'freeze'):
+        gc.freeze()
+
+
+def on_starting(server):
+    metrics.clear(metrics_dir)
+
+
+def on_exit(server):
+    metrics.clear(metrics_dir)
+
+
+def post_fork(server, worker):
+    metrics.start_flusher()
+
+
+def worker_exit(server, worker):
+    metrics.flush()
+
+
+def child_exit(server, worker):
+    metrics.mark_dead(worker.pid)
+
+
+def when_ready(server):
+    freeze()
+    if Dataset.instances:
+        pid = os.getpid()
+        watch_changes(Dataset.instances,
+                      lambda: os.kill(pid, signal.SIGHUP),
+                      min(i.interval for i in Dataset.instances))
+
+
+def on_reload(server):
+    # Runs in the master's main thread, before the new workers fork.
+    for dataset in Dataset.instances:
+        try:
+            dataset.reload()
+        except Exception:
+            logging.getLogger('tracker').exception(
+                'reloading %s failed', dataset.get_paths())
+    freeze()
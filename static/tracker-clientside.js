@@ -0,0 +1,295 @@
+// Client-side filtering for dashboards with clientside=True in their spec.
+//
+// The server ships the whole frame once as a dictionary-encoded blob (see
+// tracker/client.py) under a content-hashed URL, so the browser caches it
+// between visits. Dropdown changes then recompute the widgets, the table
+// rows and the dropdown options here without a server round trip; the CSV
+// is only built when the download button is clicked.
+(function () {
+    var loaded = {};
+    var loading = {};
+
+    function parse(blob) {
+        var columns = {};
+        blob.columns.forEach(function (column) {
+            columns[column.name] = column;
+        });
+        return {
+            rows: blob.rows,
+            names: blob.columns.map(function (i) { return i.name; }),
+            columns: columns,
+            totals: {}
+        };
+    }
+
+    // Clientside callbacks have to return synchronously, so the blob is
+    // fetched in the background and the page polls until it is in.
+    function fetchData(url) {
+        if (loaded[url] || loading[url]) {
+            return;
+        }
+        loading[url] = fetch(url, {credentials: 'same-origin'})
+            .then(function (response) {
+                if (!response.ok) {
+                    throw new Error('loading ' + url + ' failed: ' +
+                                    response.status);
+                }
+                return response.json();
+            })
+            .then(function (blob) {
+                loaded[url] = parse(blob);
+            })
+            .catch(function (error) {
+                console.error(error);
+            })
+            .then(function () {
+                delete loading[url];
+            });
+    }
+
+    function getValue(column, i) {
+        if (column.values) {
+            return column.values[i];
+        }
+        var code = column.codes[i];
+        return code < 0 ? null : column.labels[code];
+    }
+
+    // Rows matching every selection, and the per-label row counts of each
+    // filter given the other filters' selections: a row counts for a
+    // filter when it fails no selection but possibly that filter's own.
+    function select(data, filters, opts) {
+        var tests = [];
+        var codes = filters.map(function (header) {
+            return data.columns[header].codes;
+        });
+        var facets = filters.map(function (header) {
+            return data.columns[header].labels.map(function () { return 0; });
+        });
+        filters.forEach(function (header, k) {
+            var opt = opts[k];
+            if (!opt || !opt.length) {
+                return;
+            }
+            var wanted = {};
+            opt.forEach(function (i) { wanted[String(i)] = true; });
+            tests.push({
+                filter: k,
+                codes: codes[k],
+                keep: data.columns[header].labels.map(function (i) {
+                    return wanted[String(i)] === true;
+                })
+            });
+        });
+        var rows = [];
+        var n = tests.length;
+        for (var i = 0; i < data.rows; i++) {
+            var fails = 0;
+            var failed = -1;
+            for (var t = 0; t < n && fails < 2; t++) {
+                var code = tests[t].codes[i];
+                if (code < 0 || !tests[t].keep[code]) {
+                    fails += 1;
+                    failed = tests[t].filter;
+                }
+            }
+            if (fails === 0) {
+                rows.push(i);
+            } else if (fails > 1) {
+                continue;
+            }
+            for (var k = 0; k < codes.length; k++) {
+                if (fails === 0 || failed === k) {
+                    var label = codes[k][i];
+                    if (label >= 0) {
+                        facets[k][label] += 1;
+                    }
+                }
+            }
+        }
+        return {rows: rows, facets: facets};
+    }
+
+    // Mirrors get_facet_options in tracker/engine.py.
+    function getOptions(data, header, counts, opt) {
+        var selected = {};
+        (opt || []).forEach(function (i) { selected[String(i)] = true; });
+        var options = [];
+        data.columns[header].labels.forEach(function (label, code) {
+            if (counts[code] || selected[String(label)]) {
+                options.push({label: label + ' (' + counts[code] + ')',
+                              value: label});
+            }
+        });
+        return options;
+    }
+
+    function countDistinct(column, rows) {
+        var seen = new Set();
+        rows.forEach(function (i) {
+            var value = getValue(column, i);
+            if (value !== null) {
+                seen.add(value);
+            }
+        });
+        return seen.size;
+    }
+
+    function allRows(data) {
+        var rows = new Array(data.rows);
+        for (var i = 0; i < data.rows; i++) {
+            rows[i] = i;
+        }
+        return rows;
+    }
+
+    function percent(fraction) {
+        return (100 * fraction).toFixed(2) + '%';
+    }
+
+    // Mirrors get_fig_dict in tracker/widgets.py.
+    function pie(yes, no, header) {
+        if (yes + no === 0) {
+            no = 1;
+        }
+        var text = percent(yes / (yes + no)) + '<br />' +
+            header.replace('Data ', 'Data<br />');
+        return {
+            data: [{
+                values: [yes, no],
+                labels: ['Complete', 'Waiting'],
+                marker: {colors: ['#009ABA', '#ED309D']},
+                textposition: 'none',
+                hole: 0.95,
+                type: 'pie'
+            }],
+            layout: {
+                showlegend: false,
+                height: 210,
+                width: 150,
+                margin: {b: 0, l: 0, r: 0, t: 0, pad: 0},
+                annotations: [{x: 0.5, y: 0.5, text: text, showarrow: false}]
+            }
+        };
+    }
+
+    function getWidgetValues(data, spec, rows) {
+        var values = [];
+        spec.headers.forEach(function (header) {
+            var column = data.columns[header];
+            if (spec.widget === 'distinct') {
+                if (data.totals[header] === undefined) {
+                    data.totals[header] = countDistinct(column, allRows(data));
+                }
+                var total = data.totals[header];
+                var query = countDistinct(column, rows);
+                var pct = percent(query / total);
+                values.push({width: pct, height: '25px', 'font-size': '14'});
+                values.push(pct + ' (' + query + '/' + total + ')');
+                return;
+            }
+            var yes = 0;
+            rows.forEach(function (i) {
+                if (getValue(column, i) === 1) {
+                    yes += 1;
+                }
+            });
+            var no = rows.length - yes;
+            if (spec.widget === 'pie') {
+                values.push(pie(yes, no, header));
+                return;
+            }
+            var fraction = yes + no === 0 ? 0 : yes / (yes + no);
+            values.push({width: percent(fraction), height: '20px',
+                         'text-align': 'left', 'padding-left': '10'});
+            values.push(header + ': ' + percent(fraction));
+        });
+        return values;
+    }
+
+    function formatCsv(value) {
+        if (value === null || value === undefined) {
+            return '';
+        }
+        value = String(value);
+        if (/[",\n\r]/.test(value)) {
+            return '"' + value.replace(/"/g, '""') + '"';
+        }
+        return value;
+    }
+
+    var exportUrl = null;
+
+    function getExportUrl(data, rows) {
+        var lines = [data.names.map(formatCsv).join(',')];
+        var columns = data.names.map(function (i) { return data.columns[i]; });
+        rows.forEach(function (i) {
+            lines.push(columns.map(function (column) {
+                return formatCsv(getValue(column, i));
+            }).join(','));
+        });
+        if (exportUrl !== null) {
+            URL.revokeObjectURL(exportUrl);
+        }
+        exportUrl = URL.createObjectURL(
+            new Blob([lines.join('\n') + '\n'], {type: 'text/csv'}));
+        return exportUrl;
+    }
+
+    function download(url, name) {
+        var link = document.createElement('a');
+        link.href = url;
+        link.download = name;
+        document.body.appendChild(link);
+        link.click();
+        document.body.removeChild(link);
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        tracker: {
+            load_data: function (n_intervals, spec) {
+                fetchData(spec.url);
+                if (!loaded[spec.url]) {
+                    return [false, window.dash_clientside.no_update];
+                }
+                return [true, spec.url];
+            },
+            update_dashboard: function () {
+                var opts = Array.prototype.slice.call(arguments);
+                var spec = opts.pop();
+                var ready = opts.pop();
+                var data = loaded[spec.url];
+                if (!ready || !data) {
+                    throw window.dash_clientside.PreventUpdate;
+                }
+                var selected = select(data, spec.filters, opts);
+                var rows = selected.rows;
+                var options = spec.filters.map(function (header, k) {
+                    return getOptions(data, header, selected.facets[k],
+                                      opts[k]);
+                });
+                var records = rows.map(function (i) {
+                    var record = {};
+                    data.names.forEach(function (name) {
+                        record[name] = getValue(data.columns[name], i);
+                    });
+                    return record;
+                });
+                return getWidgetValues(data, spec, rows).concat(
+                    options, [records]);
+            },
+            export_csv: function () {
+                var opts = Array.prototype.slice.call(arguments, 1);
+                var spec = opts.pop();
+                var data = loaded[spec.url];
+                if (!data) {
+                    throw window.dash_clientside.PreventUpdate;
+                }
+                var rows = select(data, spec.filters, opts).rows;
+                var url = getExportUrl(data, rows);
+                download(url, spec.export);
+                return url;
+            }
+        }
+    });
+})();
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The apps run from the repository root, which holds the tracker package.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
@@ -0,0 +1,90 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from tracker.cache import ResultCache, get_filter_key
+
+
+def test_get_filter_key():
+    assert get_filter_key(None, ['b', 'a', 'b'], [1]) == (
+        (), ('a', 'b'), ('1',))
+
+
+def test_concurrent_lookups_compute_once():
+    cache = ResultCache(1000)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.1)
+        return np.zeros(10, dtype=bool)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(
+        cache.get('key', compute))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert len(results) == 8
+    assert all(i is results[0] for i in results)
+    assert (cache.hits, cache.misses) == (7, 1)
+
+
+def test_waiters_see_the_error():
+    cache = ResultCache(1000)
+    started = threading.Event()
+
+    def compute():
+        started.set()
+        time.sleep(0.1)
+        raise ValueError('boom')
+
+    errors = []
+
+    def get():
+        try:
+            cache.get('key', compute)
+        except ValueError as e:
+            errors.append(e)
+
+    owner = threading.Thread(target=get)
+    owner.start()
+    started.wait()
+    waiter = threading.Thread(target=get)
+    waiter.start()
+    owner.join()
+    waiter.join()
+    assert len(errors) == 2
+    assert 'key' not in cache.entries
+    # A later lookup computes again.
+    assert cache.get('key', lambda: np.ones(1)).tolist() == [1.0]
+
+
+def test_least_recently_used_is_evicted_by_size():
+    cache = ResultCache(300)
+    for key in 'abc':
+        cache.get(key, lambda: np.zeros(100, dtype=np.uint8))
+    cache.get('a', lambda: pytest.fail('a was evicted'))
+    cache.get('d', lambda: np.zeros(100, dtype=np.uint8))
+    assert list(cache.entries) == ['c', 'a', 'd']
+    assert cache.nbytes == 300
+    # Results larger than the whole cache are returned but not kept.
+    assert len(cache.get('e', lambda: np.zeros(301, dtype=np.uint8))) == 301
+    assert 'e' not in cache.entries
+    assert cache.nbytes == 300
+
+
+def test_evict_and_clear():
+    cache = ResultCache(1000)
+    for key in [('k1', 'a'), ('k1', 'b'), ('k2', 'a')]:
+        cache.put(key, np.zeros(10, dtype=np.uint8))
+    cache.evict(lambda key: key[0] == 'k1')
+    assert list(cache.entries) == [('k2', 'a')]
+    assert cache.nbytes == 10
+    cache.clear()
+    assert not cache.entries
+    assert cache.nbytes == 0
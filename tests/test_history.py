@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+
+from tracker.history import HistoryLog, index_dtype
+
+dims = ['Year', 'Title']
+headers = ['Shipped', 'Sequenced']
+
+
+def get_cells(rng, n_titles=6):
+    """Random cells for some of the (Year, Title) combinations."""
+    keys = [(year, 'T{}'.format(i)) for year in [2017, 2018]
+            for i in range(n_titles)]
+    keys = [key for key in keys if rng.random() < 0.7]
+    rows = rng.integers(1, 50, len(keys))
+    shipped = rng.integers(0, rows + 1)
+    sequenced = rng.integers(0, shipped + 1)
+    return pd.DataFrame({'Year': [i[0] for i in keys],
+                         'Title': [i[1] for i in keys],
+                         'Shipped': shipped, 'Sequenced': sequenced,
+                         'rows': rows})
+
+
+def get_state(keys, values):
+    """Cells with any count, as {(year, title): [sums..., rows]}."""
+    return dict((key, row.tolist()) for key, row in zip(keys, values)
+                if row.any())
+
+
+def expected_state(cells):
+    return dict(((str(row.Year), row.Title),
+                 [row.Shipped, row.Sequenced, row.rows])
+                for row in cells.itertuples() if row.rows)
+
+
+def make_log(tmp_path, versions, checkpoint_every=3):
+    log = HistoryLog(str(tmp_path / 'samples.history'), dims, headers,
+                     checkpoint_every)
+    for time, cells in enumerate(versions):
+        assert log.append(float(time), cells)
+    return log
+
+
+def test_replay_matches_every_version(tmp_path):
+    rng = np.random.default_rng(0)
+    versions = [get_cells(rng) for _ in range(10)]
+    log = make_log(tmp_path, versions)
+    states = [(time, get_state(keys, values))
+              for time, keys, values in log.iter_states()]
+    assert [i[0] for i in states] == list(range(10))
+    for (_, state), cells in zip(states, versions):
+        assert state == expected_state(cells)
+    index = log.get_index()
+    assert index['checkpoint'].tolist() == [i % 3 == 0 for i in range(10)]
+
+
+def test_iter_states_range(tmp_path):
+    rng = np.random.default_rng(1)
+    versions = [get_cells(rng) for _ in range(8)]
+    log = make_log(tmp_path, versions)
+    states = list(log.iter_states(4.5, 6))
+    # The state at 4.5 is the entry from 4.
+    assert [i[0] for i in states] == [4, 5, 6]
+    assert list(log.iter_states(5, 5))[0][0] == 5
+    assert [i[0] for i in log.iter_states(end=1)] == [0, 1]
+    assert [i[0] for i in log.iter_states(100)] == [7]
+
+
+def test_states_from_range_match_full_replay(tmp_path):
+    rng = np.random.default_rng(2)
+    versions = [get_cells(rng) for _ in range(9)]
+    log = make_log(tmp_path, versions)
+    for start in range(9):
+        time, keys, values = next(log.iter_states(start))
+        assert time == start
+        assert get_state(keys, values) == expected_state(versions[start])
+
+
+def test_append_skips_old_and_unchanged(tmp_path):
+    rng = np.random.default_rng(3)
+    cells = get_cells(rng)
+    log = make_log(tmp_path, [cells])
+    assert not log.append(0.0, get_cells(rng))
+    assert not log.append(1.0, cells)
+    assert len(log.get_index()) == 1
+
+
+def test_get_trend(tmp_path):
+    rng = np.random.default_rng(4)
+    versions = [get_cells(rng) for _ in range(5)]
+    log = make_log(tmp_path, versions)
+    trend = log.get_trend({'Title': ['T1', 'T2']}, 1, 3)
+    assert [i[0] for i in trend] == [1, 2, 3]
+    for (_, counts), cells in zip(trend, versions[1:4]):
+        cells = cells[cells['Title'].isin(['T1', 'T2'])]
+        rows = int(cells['rows'].sum())
+        for header in headers:
+            done = int(cells[header].sum())
+            assert counts[header] == (done, rows - done)
+
+
+def test_torn_index_record_is_dropped(tmp_path):
+    rng = np.random.default_rng(5)
+    versions = [get_cells(rng) for _ in range(4)]
+    log = make_log(tmp_path, versions[:3])
+    with open(log.index_path, 'ab') as f:
+        f.write(b'\x01' * (index_dtype.itemsize // 2))
+    assert len(log.get_index()) == 3
+    assert [i[0] for i in log.iter_states()] == [0, 1, 2]
+    assert log.append(3.0, versions[3])
+    index = log.get_index()
+    assert index['time'].tolist() == [0, 1, 2, 3]
+    assert len(open(log.index_path, 'rb').read()) == 4 * index_dtype.itemsize
+    time, keys, values = list(log.iter_states())[-1]
+    assert get_state(keys, values) == expected_state(versions[3])
+
+
+def test_unindexed_entry_is_skipped(tmp_path):
+    rng = np.random.default_rng(6)
+    versions = [get_cells(rng) for _ in range(3)]
+    log = make_log(tmp_path, versions[:2])
+    # A crash between writing an entry and its index record.
+    with open(log.path, 'ab') as f:
+        f.write(b'{"checkpoint":false,"new":[],"cells":[[0,1,1,1]]}\n')
+    assert log.append(2.0, versions[2])
+    states = [get_state(keys, values)
+              for _, keys, values in log.iter_states()]
+    assert states == [expected_state(i) for i in versions]
@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from tracker.index import FilterIndex, concat_bits
+
+headers = ['Year', 'Strategy', 'Title']
+
+
+def make_frame(rng, n, n_titles=40):
+    """Year and Title as plain columns, Strategy categorical with gaps."""
+    strategy = pd.Categorical(
+        rng.choice(['WGS', 'WXS', 'RNA-Seq', None], n),
+        categories=['RNA-Seq', 'WGS', 'WXS'])
+    return pd.DataFrame({
+        'Year': rng.integers(2015, 2020, n).astype(str),
+        'Strategy': strategy,
+        'Title': ['T{:02d}'.format(i) for i in rng.integers(0, n_titles, n)]})
+
+
+def get_brute_mask(df, header, opt):
+    return df[header].astype(object).isin(opt).values
+
+
+def get_selections(df):
+    years = sorted(df['Year'].unique())
+    titles = sorted(df['Title'].unique())
+    return [
+        [None, None, None],
+        [years[:1], None, None],
+        [None, ['WGS', 'WXS'], None],
+        [years[:2], ['WGS'], titles[:5]],
+        [None, None, titles[::3] + ['missing']],
+        [['1999'], None, None]]
+
+
+@pytest.mark.parametrize('a, b', [(0, 5), (5, 0), (8, 8), (3, 13),
+                                  (16, 7), (21, 30)])
+def test_concat_bits(a, b):
+    rng = np.random.default_rng(a * 100 + b)
+    left = rng.random(a) < 0.5
+    right = rng.random(b) < 0.5
+    bits = concat_bits(np.packbits(left), a, np.packbits(right), b)
+    assert len(bits) == (a + b + 7) // 8
+    joined = np.unpackbits(bits)
+    assert (joined[:a + b] == np.concatenate([left, right])).all()
+    assert not joined[a + b:].any()
+
+
+@pytest.mark.parametrize('max_bitmaps', [0, 8, 1000])
+def test_mask_matches_brute_force(max_bitmaps):
+    rng = np.random.default_rng(0)
+    df = make_frame(rng, 203)
+    index = FilterIndex(df, headers, max_bitmaps)
+    assert set(index.bitmaps) == set(
+        i for i in headers if len(index.labels[i]) <= max_bitmaps)
+    for opts in get_selections(df):
+        expected = np.ones(len(df), dtype=bool)
+        for header, opt in zip(headers, opts):
+            if opt:
+                expected &= get_brute_mask(df, header, opt)
+        mask = index.get_mask(*opts)
+        if not any(opts):
+            assert mask is None
+        else:
+            assert (mask == expected).all()
+            assert (index.get_rows(*opts) == np.flatnonzero(expected)).all()
+
+
+@pytest.mark.parametrize('max_bitmaps', [0, 8, 45, 1000])
+def test_extend_matches_fresh_index(max_bitmaps):
+    rng = np.random.default_rng(1)
+    # The tail adds titles, which can push Title over max_bitmaps.
+    df = pd.concat([make_frame(rng, 101, 30), make_frame(rng, 58, 60)],
+                   ignore_index=True)
+    df['Strategy'] = pd.Categorical(df['Strategy'],
+                                    categories=['RNA-Seq', 'WGS', 'WXS'])
+    fresh = FilterIndex(df, headers, max_bitmaps)
+    extended = FilterIndex(df.iloc[:101], headers, max_bitmaps).extend(df)
+    assert extended.size == fresh.size
+    assert set(extended.bitmaps) == set(fresh.bitmaps)
+    for header in headers:
+        assert extended.labels[header] == fresh.labels[header]
+        assert extended.counts[header] == fresh.counts[header]
+        assert (extended.codes[header] == fresh.codes[header]).all()
+        for label, bits in fresh.bitmaps.get(header, {}).items():
+            assert (extended.bitmaps[header][label] == bits).all()
+    for opts in get_selections(df):
+        expected = fresh.get_mask(*opts)
+        mask = extended.get_mask(*opts)
+        assert (mask is None) == (expected is None)
+        if mask is not None:
+            assert (mask == expected).all()
+
+
+@pytest.mark.parametrize('max_bitmaps', [0, 1000])
+def test_facet_counts_match_brute_force(max_bitmaps):
+    rng = np.random.default_rng(2)
+    df = make_frame(rng, 157)
+    weights = rng.integers(1, 5, len(df))
+    index = FilterIndex(df, headers, max_bitmaps)
+    for opts in get_selections(df):
+        for w in [None, weights]:
+            facets = index.get_facet_counts(opts, w)
+            for i, header in enumerate(headers):
+                # Every selection but the header's own.
+                rows = np.ones(len(df), dtype=bool)
+                for j, opt in enumerate(opts):
+                    if opt and j != i:
+                        rows &= get_brute_mask(df, headers[j], opt)
+                values = df[header].astype(object)[rows]
+                counts = (pd.Series(1 if w is None else w[rows],
+                                    index=values.index)
+                          .groupby(values.values).sum())
+                expected = dict((label, int(counts.get(label, 0)))
+                                for label in index.labels[header])
+                assert facets[header] == expected
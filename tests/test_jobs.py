@@ -0,0 +1,82 @@
+import gzip
+import os
+import threading
+import time
+
+from tracker.jobs import ExportJobs
+
+
+def wait(jobs, job_id, timeout=5):
+    start = time.time()
+    while time.time() - start < timeout:
+        status = jobs.get_status(job_id)
+        if status is not None and status['state'] in ('done', 'failed'):
+            return status
+        time.sleep(0.01)
+    raise AssertionError('job {} did not finish'.format(job_id))
+
+
+def test_identical_jobs_run_once_across_instances(tmp_path):
+    runs = []
+
+    def get_chunks():
+        runs.append(1)
+        time.sleep(0.1)
+        yield 'a,b\n1,2\n', 1
+
+    # Separate instances stand for separate workers sharing a directory.
+    pools = [ExportJobs(str(tmp_path)) for _ in range(3)]
+    ids = []
+    threads = [threading.Thread(target=lambda jobs=jobs: ids.append(
+        jobs.submit(('data.csv', 1), get_chunks, 1)))
+        for jobs in pools for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    status = wait(pools[0], ids[0])
+    assert len(set(ids)) == 1
+    assert len(runs) == 1
+    assert status['rows'] == 1
+    with gzip.open(pools[0].get_path(ids[0]), 'rb') as f:
+        assert f.read() == b'a,b\n1,2\n'
+
+
+def test_rows_are_summed_over_chunks(tmp_path):
+    jobs = ExportJobs(str(tmp_path))
+
+    def get_chunks():
+        yield 'a\n"x\ny"\n', 1
+        yield '2\n3\n', 2
+
+    job_id = jobs.submit('key', get_chunks, 3)
+    assert wait(jobs, job_id)['rows'] == 3
+
+
+def test_failed_and_stale_jobs_are_not_live(tmp_path):
+    jobs = ExportJobs(str(tmp_path), stale_after=60)
+
+    def get_chunks():
+        raise ValueError('boom')
+        yield
+
+    job_id = jobs.submit('key', get_chunks, 1)
+    status = wait(jobs, job_id)
+    assert status['state'] == 'failed'
+    assert not jobs.is_live(status)
+    # A queued job whose worker died stops updating its status.
+    jobs.set_status(job_id, state='running', rows=0, total=1)
+    assert jobs.is_live(jobs.get_status(job_id))
+    old = time.time() - 120
+    os.utime(jobs.get_path(job_id, 'json'), (old, old))
+    assert not jobs.is_live(jobs.get_status(job_id))
+
+
+def test_stale_job_is_restarted(tmp_path):
+    jobs = ExportJobs(str(tmp_path), stale_after=60)
+    job_id = jobs.get_job_id('key')
+    jobs.set_status(job_id, state='running', rows=0, total=1)
+    old = time.time() - 120
+    os.utime(jobs.get_path(job_id, 'json'), (old, old))
+    assert jobs.submit('key', lambda: iter([('a\n', 1)]), 1) == job_id
+    assert wait(jobs, job_id)['state'] == 'done'
@@ -0,0 +1,91 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tracker.manifests import (get_releases, get_timestamp, iter_cache,
+                               iter_merged, load_merged, parse_manifest)
+
+
+def write_releases(tmp_path, rng, n=40):
+    paths = []
+    for i in range(4):
+        ids = rng.choice(n * 2, n, replace=False)
+        df = pd.DataFrame({'id': ['f{}'.format(j) for j in ids],
+                           'disease_type': rng.choice(['A', 'B', 'C'], n),
+                           'release': i})
+        if i == 1:
+            # An id listed twice in one release.
+            df = pd.concat([df, df.iloc[:3].assign(release=99)])
+        if i == 3:
+            df['extra'] = 'x'
+        path = str(tmp_path / '{}-manifest.csv'.format(1500000000 + i))
+        df.to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def get_expected(paths):
+    """Newest manifest first; within one, the first row of an id."""
+    frames = []
+    for path in sorted(paths, key=get_timestamp, reverse=True):
+        frames.append(pd.read_csv(path))
+    df = pd.concat(frames, ignore_index=True, sort=False)
+    return df.drop_duplicates('id').reset_index(drop=True)
+
+
+@pytest.mark.parametrize('max_workers', [1, 2])
+def test_iter_merged_keeps_newest_row_of_every_id(tmp_path, max_workers):
+    rng = np.random.default_rng(0)
+    paths = write_releases(tmp_path, rng)
+    chunks = iter_merged(paths, 'id', str(tmp_path / 'cache'), max_workers,
+                         chunk_size=7)
+    merged = pd.concat(list(chunks), ignore_index=True)
+    expected = get_expected(paths)
+    assert list(merged.columns) == ['id', 'disease_type', 'release',
+                                    'extra']
+    assert merged['id'].tolist() == expected['id'].tolist()
+    assert merged['release'].tolist() == expected['release'].tolist()
+    assert (merged['release'] != 99).all()
+
+
+def test_load_merged_is_cached(tmp_path):
+    rng = np.random.default_rng(1)
+    paths = write_releases(tmp_path, rng)
+    cache_dir = str(tmp_path / 'cache')
+    df = load_merged(paths, 'id', categories=['disease_type'],
+                     cache_dir=cache_dir, chunk_size=9)
+    assert df['disease_type'].dtype.name == 'category'
+    assert df['id'].tolist() == get_expected(paths)['id'].tolist()
+    cached = load_merged(paths, 'id', categories=['disease_type'],
+                         cache_dir=cache_dir, chunk_size=9)
+    pd.testing.assert_frame_equal(cached, df, check_dtype=False)
+
+
+def test_parse_manifest_reads_mixed_columns_as_text(tmp_path):
+    path = str(tmp_path / '1-manifest.csv')
+    lines = ['id,size,flag'] + ['f{0},{0},1'.format(i) for i in range(6)]
+    lines += ['f6,big,0', 'f7,,1']
+    with open(path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    cache_path = parse_manifest(path, str(tmp_path / 'm.feather'), 4)
+    assert os.path.exists(cache_path)
+    df = pd.concat(list(iter_cache(cache_path, 3)), ignore_index=True)
+    assert df['size'].tolist()[5:7] == ['5', 'big']
+    assert pd.isnull(df['size'].iloc[7])
+    assert df['flag'].tolist() == [1] * 6 + [0, 1]
+
+
+def test_get_releases_skips_names_without_timestamp(tmp_path, caplog):
+    for name in ['1500000002-manifest.csv', 'old-manifest.csv',
+                 '1500000001-manifest.csv']:
+        (tmp_path / name).write_text(u'id\n')
+    pattern = str(tmp_path / '*-manifest.csv')
+    paths = get_releases(pattern)
+    assert [os.path.basename(i) for i in paths] == [
+        '1500000001-manifest.csv', '1500000002-manifest.csv']
+    assert 'old-manifest.csv' in caplog.text
+    caplog.clear()
+    get_releases(pattern)
+    assert 'old-manifest.csv' not in caplog.text
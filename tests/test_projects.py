@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from tracker.projects import ProjectRollup
+from tracker.store import compact
+
+milestones = ['Sample Shipped', 'Sequenced']
+
+
+def make_samples(rng, n, titles):
+    return pd.DataFrame({
+        'Title': rng.choice(titles, n),
+        'Sample Shipped': rng.random(n) < 0.6,
+        'Sequenced': rng.random(n) < 0.3})
+
+
+def get_expected(df_project, df):
+    """Sums per title of a full groupby, projects first, then the rest."""
+    sums = df.groupby('Title')[milestones].sum().astype(int)
+    sums['rows'] = df.groupby('Title').size()
+    keys = list(df_project['Title'].astype(str))
+    keys += sorted(set(df['Title']) - set(keys))
+    return sums.reindex(keys, fill_value=0)
+
+
+@pytest.mark.parametrize('categorical', [False, True])
+def test_extend_matches_fresh_rollup(categorical):
+    rng = np.random.default_rng(int(categorical))
+    df_project = pd.DataFrame({'Title': ['P1', 'P2', 'P3'],
+                               'PI': ['a', 'b', 'c']})
+    # The tail adds a title without a project row.
+    df = pd.concat([make_samples(rng, 80, ['P1', 'P2', 'X1']),
+                    make_samples(rng, 31, ['P2', 'X1', 'X2'])],
+                   ignore_index=True)
+    if categorical:
+        df = compact(df, ['Title'], milestones)
+    rollup = ProjectRollup(df_project, 'Title', milestones)
+    rollup.add(df.iloc[:80])
+    keys = list(rollup.keys)
+    extended = rollup.extend(df.iloc[80:])
+    fresh = ProjectRollup(df_project, 'Title', milestones)
+    fresh.add(df)
+    assert rollup.keys == keys
+    assert extended.keys == fresh.keys
+    assert (extended.sums == fresh.sums).all()
+    expected = get_expected(df_project, df)
+    assert extended.keys == list(expected.index)
+    assert (extended.sums == expected.values).all()
+    assert extended.table.equals(fresh.table)
+    # The rollup extended from is left as it was.
+    assert (rollup.sums == get_expected(
+        df_project, df.iloc[:80]).reindex(keys, fill_value=0).values).all()
+
+
+def test_add_totals_matches_add():
+    rng = np.random.default_rng(2)
+    df_project = pd.DataFrame({'Title': ['P1', 'P2']})
+    df = make_samples(rng, 50, ['P1', 'X1'])
+    totals = df.groupby('Title')[milestones].sum().astype(int)
+    totals['rows'] = df.groupby('Title').size()
+    from_totals = ProjectRollup(df_project, 'Title', milestones)
+    from_totals.add_totals(totals.reset_index())
+    from_rows = ProjectRollup(df_project, 'Title', milestones)
+    from_rows.add(df)
+    assert from_totals.keys == from_rows.keys
+    assert (from_totals.sums == from_rows.sums).all()
+
+
+def test_page_of_selected_projects():
+    df_project = pd.DataFrame({'Title': ['P1', 'P2', 'P3']})
+    df = pd.DataFrame({'Title': ['P1', 'P1', 'P2', 'P3'],
+                       'Sample Shipped': [True, False, True, False],
+                       'Sequenced': [False, False, True, False]})
+    rollup = ProjectRollup(df_project, 'Title', milestones)
+    rollup.add(df)
+    records, page_count = rollup.get_page(['P1', 'P2'], 0, 10, [], '')
+    assert page_count == 1
+    assert [(i['Title'], i['Samples'], i['Sample Shipped %'])
+            for i in records] == [('P1', 2, 50.0), ('P2', 1, 100.0)]
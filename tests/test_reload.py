@@ -0,0 +1,45 @@
+import os
+import time
+
+from tracker.reload import Dataset, watch_changes
+
+
+def test_failed_reload_is_asked_for_again(tmp_path):
+    path = str(tmp_path / 'samples.csv')
+    with open(path, 'w') as f:
+        f.write('x\n1\n')
+    broken = []
+
+    def load():
+        if broken:
+            raise ValueError('caught mid-write')
+        with open(path) as f:
+            return f.read()
+
+    dataset = Dataset([path], load, lambda snapshot: None)
+    Dataset.instances.remove(dataset)
+    calls = []
+
+    def on_change():
+        calls.append(1)
+        try:
+            dataset.reload()
+        except ValueError:
+            pass
+
+    broken.append(True)
+    with open(path, 'a') as f:
+        f.write('2\n')
+    later = time.time() + 5
+    os.utime(path, (later, later))
+    watch_changes([dataset], on_change, 0.05)
+    time.sleep(0.4)
+    failed = len(calls)
+    assert failed >= 2
+    broken.pop()
+    time.sleep(0.3)
+    assert dataset.current.df == 'x\n1\n2\n'
+    # Once loaded, the change is not reported again.
+    done = len(calls)
+    time.sleep(0.3)
+    assert len(calls) == done
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from tracker.backend import FrameBackend
+from tracker.search import OptionIndex
+from tracker.store import compact
+
+words = ['Kids', 'First', 'Study', 'Brain', 'Tumor', 'Cohort', 'Genome',
+         'Ewing', 'Sarcoma', 'kidney', 'Neuro']
+
+
+def make_labels(rng, n):
+    labels = set()
+    while len(labels) < n:
+        labels.add(' '.join(rng.choice(words, rng.integers(1, 4))))
+    return sorted(labels)
+
+
+def get_expected(labels, counts, query, limit):
+    query = query.strip().casefold()
+    matches = [(not i.casefold().startswith(query), -count, k)
+               for k, (i, count) in enumerate(zip(labels, counts))
+               if count > 0 and query in i.casefold()]
+    return [(labels[k], -count) for _, count, k in sorted(matches)[:limit]]
+
+
+@pytest.mark.parametrize('query', ['', 'k', 'ki', 'KID', 'tumor', ' brain ',
+                                   'ohort gen', 'zzz', 'e'])
+def test_search_matches_brute_force(query):
+    rng = np.random.default_rng(0)
+    labels = make_labels(rng, 120)
+    counts = rng.integers(0, 5, len(labels))
+    index = OptionIndex(labels, counts)
+    for limit in [5, 1000]:
+        assert index.search(query, limit) == get_expected(
+            labels, counts, query, limit)
+    # Counts of the caller's, such as facet counts, rank instead.
+    other = rng.integers(0, 5, len(labels))
+    assert index.search(query, 20, other) == get_expected(
+        labels, other, query, 20)
+
+
+def test_get_count():
+    index = OptionIndex(['a', 'b'], [3, 0])
+    assert index.get_count('a') == 3
+    assert index.get_count('missing') == 0
+    assert index.get_count('b', [1, 7]) == 7
+
+
+@pytest.mark.parametrize('use_cube', [True, False])
+def test_facet_counts_of_some_headers(use_cube):
+    rng = np.random.default_rng(1)
+    n = 300
+    df = compact(pd.DataFrame({
+        'Title': rng.choice(['T{}'.format(i) for i in range(12)], n),
+        'Year': rng.choice(['2016', '2017', '2018'], n),
+        'Institution Name': rng.choice(['A', 'B', 'C', 'D'], n),
+        'Sample Shipped': rng.random(n) < 0.6}),
+        ['Title', 'Year', 'Institution Name'], ['Sample Shipped'])
+    filters = ['Title', 'Year', 'Institution Name']
+    backend = FrameBackend(df, ('k',), filters, ['Sample Shipped'],
+                           use_cube=use_cube)
+    for selection in [{}, {'Title': ['T1', 'T2']},
+                      {'Title': ['T1', 'T2'], 'Year': ['2017']},
+                      {'Institution Name': ['B']}]:
+        full = backend.get_facet_counts(selection)
+        for header in filters:
+            assert backend.get_facet_counts(selection, [header]) == {
+                header: full[header]}
+        if not selection:
+            assert full == dict(
+                (i, backend.filter_index.get_counts(i)) for i in filters)
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from tracker.backend import FrameBackend
+from tracker.sqlite import SQLiteBackend, ingest
+from tracker.store import load_csv
+
+filters = ['Title', 'Year', 'Institution Name']
+milestones = ['Sample Shipped', 'Sequenced']
+distinct = ['Participant ID']
+
+
+@pytest.fixture(scope='module')
+def backends(tmp_path_factory):
+    rng = np.random.default_rng(0)
+    n = 500
+    df = pd.DataFrame({
+        'Sample ID': ['S{:04d}'.format(i) for i in rng.permutation(n)],
+        'Participant ID': rng.integers(0, 120, n),
+        'Title': rng.choice(['Kids {}'.format(i) for i in range(15)] +
+                            [None], n),
+        'Year': rng.choice([2015, 2016, 2017, 2018], n),
+        'Institution Name': rng.choice(['A', 'B', 'C', 'D'], n),
+        'Samples': rng.integers(0, 40, n),
+        'Sample Shipped': rng.random(n) < 0.6,
+        'Sequenced': rng.random(n) < 0.3})
+    path = str(tmp_path_factory.mktemp('data') / 'samples.csv')
+    df.to_csv(path, index=False)
+    cache_dir = str(tmp_path_factory.mktemp('cache'))
+    frame = FrameBackend(load_csv(path, filters, milestones,
+                                  cache_dir=cache_dir),
+                         ('frame',), filters, milestones, distinct)
+    db_path = ingest(path, filters, milestones, distinct, cache_dir)
+    return frame, SQLiteBackend(db_path, ('sqlite',), filters, milestones,
+                                distinct)
+
+
+def get_selections(frame):
+    rng = np.random.default_rng(1)
+    options = dict((i, [j['value'] for j in frame.get_options(i)])
+                   for i in filters)
+    selections = [{}, {'Title': ['missing']}]
+    for _ in range(20):
+        selection = {}
+        for header in filters:
+            if rng.random() < 0.5:
+                k = rng.integers(1, 4)
+                selection[header] = [
+                    str(i) for i in rng.choice(options[header], k)]
+        selections.append(selection)
+    return selections
+
+
+def get_facets(backend, selection):
+    counts = backend.get_facet_counts(selection)
+    return dict((header, dict(
+        (str(i['value']), count) for i, count in zip(
+            backend.get_options(header), counts[header])))
+        for header in filters)
+
+
+def test_same_options(backends):
+    frame, sqlite = backends
+    for header in filters:
+        assert ([str(i['value']) for i in frame.get_options(header)] ==
+                [str(i['value']) for i in sqlite.get_options(header)])
+
+
+def test_same_counts(backends):
+    frame, sqlite = backends
+    for selection in get_selections(frame):
+        assert frame.get_count(selection) == sqlite.get_count(selection)
+        assert (frame.get_milestone_counts(selection) ==
+                sqlite.get_milestone_counts(selection))
+        assert (frame.get_distinct_counts(selection) ==
+                sqlite.get_distinct_counts(selection))
+        assert get_facets(frame, selection) == get_facets(sqlite, selection)
+
+
+@pytest.mark.parametrize('sort_by, filter_query', [
+    ([], ''),
+    ([{'column_id': 'Samples', 'direction': 'desc'}], ''),
+    ([{'column_id': 'Title', 'direction': 'asc'}], '{Samples} lt 20'),
+    ([{'column_id': 'Year', 'direction': 'desc'}],
+     '{Year} ge 2016 && {Title} contains KIDS 1')])
+def test_same_pages(backends, sort_by, filter_query):
+    frame, sqlite = backends
+    for selection in get_selections(frame)[:8]:
+        for page_current in [0, 2]:
+            pages = [backend.get_page(selection, page_current, 25, sort_by,
+                                      filter_query)
+                     for backend in (frame, sqlite)]
+            assert pages[0][1] == pages[1][1]
+            assert ([i['Sample ID'] for i in pages[0][0]] ==
+                    [i['Sample ID'] for i in pages[1][0]])
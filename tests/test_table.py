@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from tracker.store import compact
+from tracker.table import TablePager, parse_filter_query
+
+
+def make_frame(rng, n, start=0):
+    return pd.DataFrame({
+        'Sample ID': ['S{:05d}'.format(i) for i in rng.permutation(n) +
+                      start],
+        'Title': rng.choice(['b', 'a', 'c', None], n),
+        'Year': rng.choice([2017.0, 2015.0, np.nan], n),
+        'Samples': rng.integers(0, 50, n),
+        'Shipped': rng.random(n) < 0.5})
+
+
+def get_expected_order(df, column):
+    values = pd.Series(df[column].values)
+    return values.sort_values(kind='mergesort', na_position='last').index
+
+
+@pytest.mark.parametrize('query, parts', [
+    ('', []),
+    ('{Year} ge 2017', [('Year', 'ge', 2017.0)]),
+    ('{Title} contains kids && {Samples} lt 10',
+     [('Title', 'contains', 'kids'), ('Samples', 'lt', 10.0)]),
+    ('{Title} eq "a b"', [('Title', 'eq', 'a b')]),
+    ("{Title} ne 'it\\'s'", [('Title', 'ne', "it's")]),
+    ('{Contact PI} eq PI 01', [('Contact PI', 'eq', 'PI 01')]),
+    ('nothing to parse', [])])
+def test_parse_filter_query(query, parts):
+    assert parse_filter_query(query) == parts
+
+
+def test_filter_query_rows():
+    df = pd.DataFrame({'Title': ['Kids A', 'kids b', 'Other', None],
+                       'Year': [2015, 2017, 2018, 2019],
+                       'Code': ['1', '2', '10', '2']})
+    df = compact(df, ['Title'])
+    pager = TablePager(df)
+
+    def get_rows(query, mask=None):
+        return pager.get_rows(mask, [], query).tolist()
+
+    assert get_rows('{Title} contains KIDS') == [0, 1]
+    assert get_rows('{Year} ge 2017 && {Year} lt 2019') == [1, 2]
+    assert get_rows('{Year} ne 2017') == [0, 2, 3]
+    # Text columns compare numbers typed in the filter as text.
+    assert get_rows('{Code} eq 2') == [1, 3]
+    assert get_rows('{Title} eq Other') == [2]
+    assert get_rows('{Missing} eq 1') == [0, 1, 2, 3]
+    mask = np.array([True, False, True, True])
+    assert get_rows('{Year} gt 2015', mask) == [2, 3]
+
+
+def test_sorted_pages():
+    rng = np.random.default_rng(0)
+    df = compact(make_frame(rng, 53), ['Title'], ['Shipped'])
+    pager = TablePager(df, ['Shipped'])
+    sort_by = [{'column_id': 'Year', 'direction': 'desc'}]
+    records, page_count = pager.get_page(None, 1, 10, sort_by, '')
+    assert page_count == 6
+    years = [i['Year'] for i in pager.get_page(None, 0, 60, sort_by, '')[0]]
+    valid = [i for i in years if i is not None]
+    assert valid == sorted(valid, reverse=True)
+    assert years[len(valid):] == [None] * (len(years) - len(valid))
+    assert set(i['Shipped'] for i in records) <= {0, 1}
+
+
+def test_orders_match_a_full_sort():
+    rng = np.random.default_rng(1)
+    df = compact(make_frame(rng, 301), ['Title'], ['Shipped'])
+    pager = TablePager(df, ['Shipped'])
+    pager.build_orders()
+    assert set(pager.orders) == set(df.columns)
+    for column in df.columns:
+        assert (pager.get_order(column) ==
+                get_expected_order(df, column)).all()
+
+
+@pytest.mark.parametrize('size, added', [(200, 1), (200, 37), (8, 100)])
+def test_extend_merges_orders(size, added):
+    rng = np.random.default_rng(size + added)
+    df = compact(pd.concat([make_frame(rng, size),
+                            make_frame(rng, added, size)],
+                           ignore_index=True), ['Title'], ['Shipped'])
+    pager = TablePager(df.iloc[:size], ['Shipped'])
+    pager.build_orders()
+    extended = pager.extend(df)
+    fresh = TablePager(df, ['Shipped'])
+    for column in df.columns:
+        for descending in [False, True]:
+            assert (extended.get_order(column, descending) ==
+                    fresh.get_order(column, descending)).all()
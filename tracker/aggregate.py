@@ -0,0 +1,72 @@
+import copy
+
+import numpy as np
+import pandas as pd
+
+from .index import FilterIndex
+
+
+class MilestoneCounter(object):
+    """Complete/waiting counts of every milestone flag in one reduction."""
+
+    def __init__(self, df, headers):
+        self.headers = list(headers)
+        self.flags = np.asarray(df[self.headers].values, dtype=bool)
+        self.totals = self.get_counts(None)
+
+    def extend(self, df):
+        counter = copy.copy(self)
+        delta = df[self.headers].values[len(self.flags):]
+        counter.flags = np.vstack([self.flags, np.asarray(delta, dtype=bool)])
+        counter.totals = counter.get_counts(None)
+        return counter
+
+    def get_counts(self, mask):
+        flags = self.flags if mask is None else self.flags[mask]
+        complete = np.count_nonzero(flags, axis=0)
+        return dict(
+            (header, (int(yes), len(flags) - int(yes)))
+            for header, yes in zip(self.headers, complete))
+
+
+class MilestoneCube(object):
+    """Milestone sums and row counts grouped by the filter dimensions.
+
+    Filters are answered by summing the matching cube cells, so the cost
+    depends on the number of distinct groups rather than rows.
+    """
+
+    def __init__(self, df, dims, headers):
+        self.dims = list(dims)
+        self.headers = list(headers)
+        self.set_cells(self.get_cells(df))
+
+    def get_cells(self, df):
+        grouped = df.groupby(self.dims, observed=True, dropna=False)
+        cells = grouped[self.headers].sum()
+        cells['rows'] = grouped.size()
+        return cells.reset_index()
+
+    def set_cells(self, cells):
+        self.cells = cells
+        self.index = FilterIndex(cells, self.dims)
+        self.sums = cells[self.headers + ['rows']].values.astype(np.int64)
+        self.totals = self.get_counts()
+
+    def extend(self, delta):
+        """Return a cube with the rows of the delta frame added in."""
+        cube = copy.copy(self)
+        cells = pd.concat([self.cells, self.get_cells(delta)],
+                          ignore_index=True)
+        grouped = cells.groupby(self.dims, observed=True, dropna=False)
+        cube.set_cells(grouped[self.headers + ['rows']].sum().reset_index())
+        return cube
+
+    def get_counts(self, *opts):
+        mask = self.index.get_mask(*opts)
+        sums = self.sums if mask is None else self.sums[mask]
+        sums = sums.sum(axis=0)
+        rows = int(sums[-1])
+        return dict(
+            (header, (int(yes), rows - int(yes)))
+            for header, yes in zip(self.headers, sums[:-1]))
@@ -0,0 +1,102 @@
+"""Fingerprinted, precompressed static files.
+
+Every file under the static directory is read once at startup and served
+from memory. get_url() returns /static/<digest>/<name>, which is cached
+by browsers for a year; the plain /static/<name> still works but has to
+be revalidated with its ETag.
+"""
+import gzip
+import hashlib
+import io
+import mimetypes
+import os
+
+import flask
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+compress_types = ('text/', 'application/javascript', 'application/json',
+                  'image/svg+xml')
+immutable = 'public, max-age=31536000, immutable'
+revalidate = 'public, no-cache'
+
+
+def gzip_bytes(data, level=9):
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode='wb', compresslevel=level,
+                       mtime=0) as f:
+        f.write(data)
+    return buf.getvalue()
+
+
+class Asset(object):
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.data = f.read()
+        self.digest = hashlib.sha1(self.data).hexdigest()[:12]
+        self.etag = self.digest
+        self.mimetype = (mimetypes.guess_type(path)[0] or
+                         'application/octet-stream')
+        self.encodings = {}
+        if self.mimetype.startswith(compress_types):
+            self.add_encoding('gzip', gzip_bytes(self.data))
+            if brotli is not None:
+                self.add_encoding('br', brotli.compress(self.data))
+
+    def add_encoding(self, name, data):
+        if len(data) < len(self.data):
+            self.encodings[name] = data
+
+    def get_encoding(self, accept_encoding):
+        for name in ('br', 'gzip'):
+            if name in self.encodings and name in accept_encoding:
+                return name
+        return None
+
+
+class AssetStore(object):
+
+    def __init__(self, directory, route='/static'):
+        self.directory = directory
+        self.route = route
+        self.assets = {}
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            if os.path.isfile(path):
+                self.assets[name] = Asset(path)
+
+    def get_url(self, name):
+        asset = self.assets.get(name)
+        if asset is None:
+            return '{}/{}'.format(self.route, name)
+        return '{}/{}/{}'.format(self.route, asset.digest, name)
+
+    def get_response(self, name, digest=None):
+        asset = self.assets.get(name)
+        if asset is None or digest not in (None, asset.digest):
+            flask.abort(404)
+        headers = {'ETag': '"{}"'.format(asset.etag),
+                   'Cache-Control': immutable if digest else revalidate}
+        if asset.encodings:
+            headers['Vary'] = 'Accept-Encoding'
+        if flask.request.if_none_match.contains(asset.etag):
+            return flask.Response(status=304, headers=headers)
+        data = asset.data
+        encoding = asset.get_encoding(
+            flask.request.headers.get('Accept-Encoding', ''))
+        if encoding is not None:
+            data = asset.encodings[encoding]
+            headers['Content-Encoding'] = encoding
+        return flask.Response(data, mimetype=asset.mimetype, headers=headers)
+
+    def init_app(self, server):
+        server.add_url_rule(
+            self.route + '/<resource>', 'tracker_static',
+            lambda resource: self.get_response(resource))
+        server.add_url_rule(
+            self.route + '/<digest>/<resource>', 'tracker_static_hashed',
+            lambda digest, resource: self.get_response(resource, digest))
@@ -0,0 +1,170 @@
+import numpy as np
+
+from .aggregate import MilestoneCounter, MilestoneCube
+from .cache import get_filter_key
+from .client import get_client_data
+from .distinct import DistinctCounter
+from .export import iter_csv
+from .index import FilterIndex, get_faceted
+from .metrics import phase
+from .search import OptionIndex
+from .table import TablePager
+
+
+class FrameBackend(object):
+    """Answers dashboard queries over one in-memory snapshot of a frame.
+
+    Selections are dicts of filter header to selected values; headers a
+    dashboard does not filter on are simply absent. Masks are cached in
+    the shared result cache under key + the selection, so evicting a
+    snapshot's entries only needs its key.
+    """
+
+    def __init__(self, df, key, filters, milestones=(), distinct=(),
+                 cache=None, use_cube=True, approximate=False):
+        self.df = df
+        self.key = key
+        self.filters = list(filters)
+        self.milestones = list(milestones)
+        self.distinct = list(distinct)
+        self.cache = cache
+        self.use_cube = use_cube
+        self.approximate = approximate
+        self.columns = [str(i) for i in df.columns]
+        self.filter_index = FilterIndex(df, self.filters)
+        self.build_search()
+        self.milestone_counter = MilestoneCounter(df, self.milestones)
+        self.milestone_cube = None
+        if use_cube and self.milestones:
+            self.milestone_cube = MilestoneCube(
+                df, self.filters, self.milestones)
+        self.build_distinct()
+        self.table_pager = TablePager(df, self.milestones)
+        # Here, in the master, so forked workers share the orders.
+        self.table_pager.build_orders()
+        self.client_data = None
+
+    def build_search(self):
+        self.option_indexes = dict(
+            (i, OptionIndex(self.filter_index.labels[i],
+                            self.filter_index.get_counts(i)))
+            for i in self.filters)
+
+    def build_distinct(self):
+        self.distinct_counters = dict(
+            (i, DistinctCounter(self.df[i], approximate=self.approximate))
+            for i in self.distinct)
+
+    def extend(self, df, key):
+        """Return a backend over df, whose leading rows are this one's."""
+        backend = FrameBackend.__new__(FrameBackend)
+        backend.__dict__.update(self.__dict__)
+        backend.df = df
+        backend.key = key
+        backend.filter_index = self.filter_index.extend(df)
+        backend.build_search()
+        backend.milestone_counter = self.milestone_counter.extend(df)
+        if self.milestone_cube is not None:
+            backend.milestone_cube = self.milestone_cube.extend(
+                df.iloc[len(self.df):])
+        backend.build_distinct()
+        backend.table_pager = self.table_pager.extend(df)
+        backend.client_data = None
+        return backend
+
+    def get_client_data(self):
+        """The encoded frame for client-side filtering, built once."""
+        if self.client_data is None:
+            self.client_data = get_client_data(
+                self.df, self.filter_index, self.milestones)
+        return self.client_data
+
+    def get_opts(self, selection):
+        return [selection.get(i) for i in self.filters]
+
+    def get_options(self, header):
+        return self.filter_index.get_options(header)
+
+    def search_options(self, header, query='', limit=50, counts=None):
+        return self.option_indexes[header].search(query, limit, counts)
+
+    def get_option_count(self, header, value, counts=None):
+        return self.option_indexes[header].get_count(str(value), counts)
+
+    def get_facet_counts(self, selection, headers=None):
+        """Per-option row counts of the dropdowns, given the others.
+
+        Counts are in the order of get_options, for headers (default all
+        filters). The cube answers from its cells weighted by their rows
+        when there is one.
+        """
+        facets = dict((header, self.option_indexes[header].counts.tolist())
+                      for header in headers or self.filters)
+        faceted = get_faceted(self.filters, selection, headers)
+        if not faceted:
+            return facets
+        opts = self.get_opts(selection)
+        with phase('facets'):
+            if self.milestone_cube is not None:
+                cube = self.milestone_cube
+                counts = cube.index.get_facet_counts(
+                    opts, cube.sums[:, -1], faceted)
+            else:
+                counts = self.filter_index.get_facet_counts(
+                    opts, headers=faceted)
+        for header in faceted:
+            facets[header] = [counts[header].get(i, 0)
+                              for i in self.filter_index.labels[header]]
+        return facets
+
+    def get_mask(self, selection):
+        opts = self.get_opts(selection)
+        key = get_filter_key(*opts)
+        if not any(key):
+            return None
+        with phase('filter'):
+            if self.cache is None:
+                return self.filter_index.get_mask(*opts)
+            return self.cache.get(
+                self.key + key, lambda: self.filter_index.get_mask(*opts))
+
+    def get_milestone_counts(self, selection):
+        if self.milestone_cube is not None:
+            with phase('aggregate'):
+                return self.milestone_cube.get_counts(
+                    *self.get_opts(selection))
+        mask = self.get_mask(selection)
+        with phase('aggregate'):
+            return self.milestone_counter.get_counts(mask)
+
+    def get_milestone_cells(self):
+        """Milestone sums and rows per combination of dropdown values."""
+        if self.milestone_cube is not None:
+            return self.milestone_cube.cells
+        return MilestoneCube(self.df, self.filters, self.milestones).cells
+
+    def get_distinct_counts(self, selection):
+        mask = self.get_mask(selection)
+        with phase('aggregate'):
+            return dict((header, (counter.get_count(mask), counter.total))
+                        for header, counter in self.distinct_counters.items())
+
+    def get_page(self, selection, page_current, page_size, sort_by,
+                 filter_query):
+        return self.table_pager.get_page(
+            self.get_mask(selection), page_current, page_size, sort_by,
+            filter_query)
+
+    def get_count(self, selection):
+        mask = self.get_mask(selection)
+        return len(self.df) if mask is None else int(mask.sum())
+
+    def select(self, selection):
+        mask = self.get_mask(selection)
+        return self.df if mask is None else self.df[mask]
+
+    def iter_csv(self, selection, chunk_size=10000, counts=False):
+        mask = self.get_mask(selection)
+        rows = None if mask is None else np.flatnonzero(mask)
+        return iter_csv(self.df, chunk_size, rows, self.milestones, counts)
+
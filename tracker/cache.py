@@ -0,0 +1,93 @@
+import threading
+from collections import OrderedDict
+
+
+def get_filter_key(*opts):
+    return tuple(tuple(sorted(set(str(i) for i in opt))) if opt else ()
+                 for opt in opts)
+
+
+def get_nbytes(value):
+    if hasattr(value, 'memory_usage'):
+        # Filtered frames share their string objects with the source frame,
+        # so the shallow size is what a cached result actually adds.
+        return int(value.memory_usage(index=True).sum())
+    return int(getattr(value, 'nbytes', 0))
+
+
+class _Pending(object):
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ResultCache(object):
+    """Thread-safe LRU of filter results, bounded by their size in bytes.
+
+    Concurrent lookups of a key that is still being computed wait for that
+    computation instead of repeating it.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.entries = OrderedDict()
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    def get(self, key, compute):
+        with self.lock:
+            if key in self.entries:
+                self.hits += 1
+                entry = self.entries.pop(key)
+                self.entries[key] = entry
+                return entry[0]
+            pending = self.pending.get(key)
+            owner = pending is None
+            if owner:
+                self.misses += 1
+                pending = self.pending[key] = _Pending()
+            else:
+                self.hits += 1
+        if not owner:
+            pending.event.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.value
+        try:
+            pending.value = compute()
+            self.put(key, pending.value)
+        except Exception as e:
+            pending.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.pending[key]
+            pending.event.set()
+        return pending.value
+
+    def put(self, key, value):
+        size = get_nbytes(value)
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.nbytes -= self.entries.pop(key)[1]
+            self.entries[key] = (value, size)
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                self.nbytes -= self.entries.popitem(last=False)[1][1]
+
+    def evict(self, predicate):
+        with self.lock:
+            for key in [i for i in self.entries if predicate(i)]:
+                self.nbytes -= self.entries.pop(key)[1]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.nbytes = 0
@@ -0,0 +1,55 @@
+"""The whole frame as one dictionary-encoded JSON blob for the browser.
+
+Every column is sent as its distinct values plus one integer code per
+row (-1 for missing), or as plain values when nearly all of them are
+distinct. Filter columns use the dropdown labels of the filter index, so
+the browser can match selections against codes directly. Milestone flags
+are sent as 0/1, as the table and CSV download show them.
+"""
+import hashlib
+import json
+
+import numpy as np
+import pandas as pd
+
+from .assets import gzip_bytes
+
+
+def get_values(values):
+    values = np.array(values, dtype=object)
+    values[pd.isnull(values)] = None
+    return values.tolist()
+
+
+def encode_column(name, column, labels=None):
+    if labels is not None:
+        if column.dtype.name == 'category':
+            codes = column.cat.codes.values
+        else:
+            codes = pd.Categorical(column.astype(str),
+                                   categories=labels).codes
+        return {'name': name, 'labels': labels, 'codes': codes.tolist()}
+    codes, uniques = pd.factorize(column)
+    if len(uniques) > len(column) // 2:
+        return {'name': name, 'values': get_values(column.values)}
+    return {'name': name, 'labels': get_values(uniques),
+            'codes': codes.tolist()}
+
+
+def encode_frame(df, filter_index, flags=()):
+    columns = []
+    for name in df.columns:
+        column = df[name]
+        if name in flags:
+            column = column.astype(int)
+        labels = filter_index.labels.get(name)
+        columns.append(encode_column(str(name), column, labels))
+    return {'rows': len(df), 'columns': columns}
+
+
+def get_client_data(df, filter_index, flags=()):
+    """(digest, JSON bytes, gzipped JSON bytes) of the encoded frame."""
+    data = json.dumps(encode_frame(df, filter_index, flags), default=str,
+                      separators=(',', ':')).encode('utf-8')
+    digest = hashlib.sha1(data).hexdigest()[:16]
+    return digest, data, gzip_bytes(data, 6)
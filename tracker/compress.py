@@ -0,0 +1,50 @@
+"""gzip/brotli for callback and layout JSON.
+
+Streamed responses (CSV exports) compress themselves and responses that
+already carry a Content-Encoding (static assets) are left alone.
+"""
+import zlib
+
+import flask
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+compress_types = ('application/json', 'text/html', 'text/plain')
+
+
+def get_encoding(accept_encoding):
+    if brotli is not None and 'br' in accept_encoding:
+        return 'br'
+    if 'gzip' in accept_encoding:
+        return 'gzip'
+    return None
+
+
+def compress(data, encoding, level):
+    if encoding == 'br':
+        return brotli.compress(data, quality=min(level, 11))
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+def compress_responses(server, min_size=1024, level=5):
+    @server.after_request
+    def compress_response(response):
+        if (response.status_code != 200 or response.direct_passthrough or
+                response.is_streamed or
+                'Content-Encoding' in response.headers or
+                response.mimetype not in compress_types):
+            return response
+        encoding = get_encoding(
+            flask.request.headers.get('Accept-Encoding', ''))
+        data = response.get_data()
+        if encoding is None or len(data) < min_size:
+            return response
+        response.set_data(compress(data, encoding, level))
+        response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        return response
+    return compress_response
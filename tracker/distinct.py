@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+
+class DistinctCounter(object):
+    """Distinct values of a column among the rows selected by a mask.
+
+    The column is factorized once at load. Exact counts mark the codes of
+    the selected rows in a bitset; with approximate=True a HyperLogLog
+    sketch of 2 ** precision registers is built over precomputed per-row
+    register/rank pairs instead, which keeps memory flat for columns with
+    tens of millions of distinct values.
+    """
+
+    def __init__(self, column, approximate=False, precision=14):
+        codes, uniques = pd.factorize(column)
+        self.total = len(uniques)
+        self.approximate = approximate
+        self.precision = precision
+        if not approximate:
+            self.codes = codes
+            return
+        hashes = pd.util.hash_array(np.asarray(uniques, dtype=object))
+        hashes = hashes[np.maximum(codes, 0)]
+        tail_bits = 64 - precision
+        rest = hashes & np.uint64((1 << tail_bits) - 1)
+        # Bit length of the remaining hash bits, 0 when they are all zero.
+        _, bit_length = np.frexp(rest.astype(np.float64))
+        self.registers = (hashes >> np.uint64(tail_bits)).astype(np.uint16)
+        self.ranks = (tail_bits + 1 - bit_length).astype(np.uint8)
+        self.ranks[codes < 0] = 0
+
+    def get_count(self, mask):
+        if mask is None:
+            return self.total
+        if self.approximate:
+            return self.get_estimate(mask)
+        codes = self.codes[mask]
+        seen = np.zeros(self.total, dtype=bool)
+        seen[codes[codes >= 0]] = True
+        return int(np.count_nonzero(seen))
+
+    def get_estimate(self, mask):
+        m = 1 << self.precision
+        registers = np.zeros(m, dtype=np.uint8)
+        np.maximum.at(registers, self.registers[mask], self.ranks[mask])
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.exp2(-registers.astype(float)))
+        zeros = np.count_nonzero(registers == 0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * np.log(float(m) / zeros)
+        return min(int(round(estimate)), self.total)
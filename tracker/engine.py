@@ -0,0 +1,716 @@
+"""Dashboards declared by specs and served from one Flask server.
+
+A spec is a dict:
+
+    name        URL prefix when mounted, and the metrics label
+    title       browser title
+    heading     page heading
+    logo        file in static/
+    source      CSV path, or a glob whose newest match (by the leading
+                timestamp in the file name) is loaded
+    merge       with a glob source, the id column on which every match
+                is merged instead, keeping the newest version of each id
+    filters     (header, dropdown id, column class) per dropdown
+    milestones  0/1 columns counted by the 'pie' and 'bar' widgets
+    distinct    columns whose distinct values the 'distinct' widget counts
+    widget      'pie', 'bar' or 'distinct'
+    export      file name of the CSV download
+    cube        answer milestone counts from a pre-aggregated cube
+                (default True)
+    approximate HyperLogLog distinct counts (default False)
+    search      filter headers with too many values to list up front;
+                their dropdowns start with the search_limit (default 50)
+                most common values and search the rest on the server
+                as the user types (not in clientside mode)
+    clientside  ship the frame to the browser once and filter there
+                (default False, frame backend only)
+    backend     'frame' to hold the data in pandas (default) or 'sqlite'
+                to query an indexed SQLite copy of the CSV, for data
+                larger than memory
+    projects    dict(source=CSV path, key=header) of project metadata,
+                joined to the samples on key for a table of per-project
+                milestone completion
+    trend       log the milestone counts of every version of the data
+                and chart them over time (default False)
+
+Dashboards with the same source share one Dataset, loaded once with the
+union of their columns, and all share one result cache.
+
+Every dropdown lists only the values still matching the selections of
+the others, each with its row count.
+"""
+import logging
+import os
+import time
+
+import dash
+import dash_core_components as dcc
+import dash_html_components as html
+import dash_table as dt
+import flask
+from dash.dependencies import ClientsideFunction, Input, Output, State
+
+from .assets import AssetStore
+from .backend import FrameBackend
+from .cache import ResultCache, get_filter_key
+from .compress import compress_responses
+from .export import (accepts_gzip, csv_response, get_export_opts,
+                     get_export_url)
+from .history import HistoryLog, get_history_path
+from .jobs import ExportJobs
+from .manifests import get_releases, ingest_merged, load_merged
+from .metrics import init_app, instrument, phase, register_cache
+from .projects import ProjectRollup
+from .reload import Dataset
+from .sqlite import SQLiteBackend, ingest
+from .store import load_csv
+from .widgets import get_dcc_graph, get_trend_fig_dict, widgets
+
+logger = logging.getLogger(__name__)
+
+layout = {'margin-top': '5', 'padding-right': '5', 'padding-left': '0'}
+layout_btn = {'margin-bottom': '35', 'margin-top': '5'}
+layout_table = {'font-size': '12'}
+layout_trend = {'margin-top': '15'}
+layout_projects = {'font-size': '12', 'margin-bottom': '15'}
+trend_ranges = [('4 weeks', 28), ('3 months', 91), ('1 year', 365),
+                ('all', 0)]
+table_props = ['page_current', 'page_size', 'sort_by', 'filter_query']
+
+
+def get_latest_path(pattern):
+    paths = get_releases(pattern)
+    if not paths:
+        raise ValueError('no release matches {}'.format(pattern))
+    return paths[-1]
+
+
+def get_union(specs, name):
+    headers = []
+    for spec in specs:
+        for header in spec.get(name, ()):
+            if isinstance(header, tuple):
+                header = header[0]
+            if header not in headers:
+                headers.append(header)
+    return headers
+
+
+def get_search_options(backend, header, query, limit, value=None,
+                       counts=None):
+    """Options labelled with row counts for the best matches of query.
+
+    Selected values are always included, or the dropdown would drop them.
+    """
+    matches = backend.search_options(header, query, limit, counts)
+    found = set(i[0] for i in matches)
+    for i in value or ():
+        if str(i) not in found:
+            matches.append(
+                (str(i), backend.get_option_count(header, i, counts)))
+    return [{'label': '{} ({})'.format(label, count), 'value': label}
+            for label, count in matches]
+
+
+def get_facet_options(backend, header, counts, value=None):
+    """The options still matching rows, or selected, with row counts."""
+    selected = set(str(i) for i in value or ())
+    return [{'label': '{} ({})'.format(opt['label'], count),
+             'value': opt['value']}
+            for opt, count in zip(backend.get_options(header), counts)
+            if count or str(opt['value']) in selected]
+
+
+def get_dcc_drop(header, id, opt):
+    return dcc.Dropdown(
+        id=id, options=opt,
+        multi=True,
+        placeholder=header)
+
+
+class Source(object):
+    """The dataset behind every dashboard that reads the same source.
+
+    With the sqlite backend a snapshot holds the path of the ingested
+    database instead of a frame, and every reload re-ingests. With a
+    trend, the milestone cube of each version is appended to a history
+    log in TRACKER_HISTORY_DIR (default a .history directory next to the
+    source). With projects, each snapshot carries their rollup, and a
+    change to the projects file reloads too. With merge, a new manifest
+    matching the source reloads, and only the new one is parsed; the
+    parsing runs in TRACKER_INGEST_WORKERS processes (default one per
+    CPU).
+    """
+
+    def __init__(self, source, specs, cache):
+        self.source = source
+        self.filters = get_union(specs, 'filters')
+        self.milestones = get_union(specs, 'milestones')
+        self.distinct = get_union(specs, 'distinct')
+        self.use_cube = all(i.get('cube', True) for i in specs)
+        self.approximate = any(i.get('approximate', False) for i in specs)
+        self.backend_type = specs[0].get('backend', 'frame')
+        self.merge = specs[0].get('merge')
+        self.cache = cache
+        self.projects = next(
+            (i['projects'] for i in specs if 'projects' in i), None)
+        extend = self.extend if self.backend_type == 'frame' else None
+        self.dataset = Dataset(self.get_paths, self.load, self.build,
+                               extend)
+        self.dataset.listeners.append(self.evict)
+        self.history = None
+        if self.milestones and any(i.get('trend') for i in specs):
+            self.history = HistoryLog(
+                get_history_path(source, self.filters, self.milestones,
+                                 os.environ.get('TRACKER_HISTORY_DIR')),
+                self.filters, self.milestones)
+            self.dataset.listeners.append(self.record)
+            self.record(self.dataset.current)
+
+    def get_source_paths(self):
+        if '*' not in self.source:
+            return [self.source]
+        if self.merge:
+            return get_releases(self.source)
+        return [get_latest_path(self.source)]
+
+    def get_paths(self):
+        paths = self.get_source_paths()
+        if self.projects is not None:
+            paths.append(self.projects['source'])
+        return paths
+
+    def load(self):
+        paths = self.get_source_paths()
+        if self.merge:
+            workers = os.environ.get('TRACKER_INGEST_WORKERS')
+            workers = int(workers) if workers else None
+            if self.backend_type == 'sqlite':
+                return ingest_merged(paths, self.merge, self.filters,
+                                     self.milestones, self.distinct,
+                                     max_workers=workers)
+            return load_merged(paths, self.merge, categories=self.filters,
+                               flags=self.milestones, max_workers=workers)
+        if self.backend_type == 'sqlite':
+            return ingest(paths[0], self.filters, self.milestones,
+                          self.distinct)
+        return load_csv(paths[0], categories=self.filters,
+                        flags=self.milestones)
+
+    def build(self, data):
+        if self.backend_type == 'sqlite':
+            data.backend = SQLiteBackend(
+                data.df, (self.source, data.version), self.filters,
+                self.milestones, self.distinct)
+        else:
+            data.backend = FrameBackend(
+                data.df, (self.source, data.version), self.filters,
+                self.milestones, self.distinct, cache=self.cache,
+                use_cube=self.use_cube, approximate=self.approximate)
+        data.projects = self.get_projects(data)
+
+    def extend(self, data, previous):
+        data.backend = previous.backend.extend(
+            data.df, (self.source, data.version))
+        data.projects = previous.projects
+        if data.projects is None:
+            return
+        if data.projects.mtime != os.path.getmtime(self.projects['source']):
+            data.projects = self.get_projects(data)
+        else:
+            data.projects = previous.projects.extend(
+                data.df.iloc[len(previous.df):])
+
+    def get_projects(self, data):
+        if self.projects is None:
+            return None
+        path = self.projects['source']
+        mtime = os.path.getmtime(path)
+        rollup = ProjectRollup(load_csv(path), self.projects['key'],
+                               self.milestones)
+        if self.backend_type == 'sqlite':
+            rollup.add_totals(data.backend.get_milestone_totals(rollup.key))
+        else:
+            rollup.add(data.df)
+        rollup.mtime = mtime
+        return rollup
+
+    def evict(self, data, previous):
+        key = previous.backend.key
+        self.cache.evict(lambda i: i[:len(key)] == key)
+
+    def record(self, data, previous=None):
+        """Log a version's milestone cube, dated by the source's mtime."""
+        mtime = max(i[2] for i in self.dataset.signature)
+        try:
+            self.history.append(mtime, data.backend.get_milestone_cells())
+        except (OSError, ValueError):
+            logger.exception('recording history of %s failed', self.source)
+
+    @property
+    def backend(self):
+        return self.dataset.current.backend
+
+
+class Dashboard(object):
+    """One Dash app built from a spec, mounted at prefix."""
+
+    def __init__(self, spec, source, engine, prefix='/'):
+        self.spec = spec
+        self.name = spec['name']
+        self.source = source
+        self.engine = engine
+        self.headers = [i[0] for i in spec['filters']]
+        self.ids = [i[1] for i in spec['filters']]
+        self.search_limit = spec.get('search_limit', 50)
+        widget = widgets[spec['widget']]
+        self.widget = widget(spec.get(
+            'distinct' if widget.counts == 'distinct' else 'milestones'))
+        self.export_route = prefix + 'export/' + spec['export']
+        self.job_route = prefix + 'export/jobs/'
+        self.client_route = prefix + 'client-data/'
+        self.clientside = spec.get('clientside', False)
+        if self.clientside and source.backend_type != 'frame':
+            raise ValueError('clientside needs the frame backend')
+        # The browser has every value in clientside mode.
+        self.search = [] if self.clientside else spec.get('search', [])
+        self.searched = [i[1] for i in spec['filters'] if i[0] in self.search]
+        self.trend = spec.get('trend', False) and source.history is not None
+        self.projects = 'projects' in spec
+        key = spec.get('projects', {}).get('key')
+        self.project_ids = [i[1] for i in spec['filters'] if i[0] == key]
+        assets = engine.assets
+        scripts = []
+        if self.clientside:
+            scripts.append(assets.get_url('tracker-clientside.js'))
+        self.app = dash.Dash(
+            self.name, server=engine.server, url_base_pathname=prefix,
+            external_stylesheets=[assets.get_url('bootstrap.min.css'),
+                                  assets.get_url('tracker.css')],
+            external_scripts=scripts)
+        self.app.title = spec['title']
+        self.app.layout = self.serve_layout
+        self.add_callbacks()
+
+    def get_selection(self, opts):
+        return dict((header, opt) for header, opt in zip(self.headers, opts)
+                    if opt)
+
+    def get_counts(self, backend, selection):
+        if self.widget.counts == 'distinct':
+            return backend.get_distinct_counts(selection)
+        return backend.get_milestone_counts(selection)
+
+    def serve_layout(self):
+        backend = self.source.backend
+        spec = self.spec
+
+        logo = html.Img(src=self.engine.assets.get_url(spec['logo']))
+        head2 = html.H2(spec['heading'])
+
+        facets = backend.get_facet_counts({})
+        drops = [
+            html.Div(get_dcc_drop(header, id,
+                                  self.get_options(backend, facets, header)),
+                     className=cls, style=layout)
+            for header, id, cls in spec['filters']
+        ]
+        widget = self.widget.get_layout(self.get_counts(backend, {}))
+        if self.widget.beside_filters:
+            body = [html.Div([html.Div(drops, className='col-sm-6'), widget],
+                             className='row')]
+        else:
+            body = [html.Div(drops, className='row'), widget]
+        if self.trend:
+            body.append(html.Div(
+                [
+                    dcc.RadioItems(
+                        id='trend-range',
+                        options=[{'label': label, 'value': days}
+                                 for label, days in trend_ranges],
+                        value=trend_ranges[1][1],
+                        labelStyle={'display': 'inline-block',
+                                    'margin-right': '10'}),
+                    get_dcc_graph('trend', self.get_trend(
+                        {}, trend_ranges[1][1]))
+                ],
+                className='row', style=layout_trend))
+
+        if self.projects:
+            projects = self.source.dataset.current.projects
+            body.append(html.Div(
+                [
+                    html.H4('Projects'),
+                    dt.DataTable(
+                        id='project-table',
+                        columns=[{'name': i, 'id': i}
+                                 for i in projects.columns],
+                        editable=False,
+                        page_action='custom', page_current=0, page_size=10,
+                        sort_action='custom', sort_mode='single',
+                        sort_by=[{'column_id': 'Samples',
+                                  'direction': 'desc'}],
+                        filter_action='custom', filter_query='')
+                ],
+                className='row', style=layout_projects))
+
+        action = 'native' if self.clientside else 'custom'
+        table = dt.DataTable(
+                    id='table',
+                    columns=[{'name': i, 'id': i} for i in backend.columns],
+                    editable=False,
+                    page_action=action, page_current=0, page_size=25,
+                    sort_action=action, sort_mode='single', sort_by=[],
+                    filter_action=action, filter_query='')
+        if self.clientside:
+            export = [
+                html.Button('download csv', id='export-button'),
+                html.A(id='export-url', download=spec['export'],
+                       style={'display': 'none'}),
+                dcc.Store(id='client-spec', data=self.get_client_spec()),
+                dcc.Store(id='client-ready'),
+                dcc.Interval(id='client-poll', interval=100)
+            ]
+        else:
+            export = [
+                html.Button('download csv', id='export-button'),
+                html.Div(self.get_export_panel(), id='export-panel')
+            ]
+
+        return html.Div(
+            [
+                html.P(' '),
+                html.Div(
+                    [
+                        html.Div(head2, id='head', className='col-sm-9'),
+                        html.Div(logo, className='col-sm-3')
+                    ],
+                    className='row'
+                ),
+                html.Hr()
+            ] + body + [
+                html.Div(table, className='row', style=layout_table),
+                html.Div(export, className='row pull-right',
+                         style=layout_btn)],
+            className='eight columns offset-by-two'
+        )
+
+    def add_callbacks(self):
+        self.engine.server.add_url_rule(
+            self.export_route, self.name + ':export_csv',
+            instrument(self.name + ':export_csv')(self.export_csv))
+        if self.clientside:
+            self.add_clientside_callbacks()
+            return
+        self.app.callback(self.get_outputs(), self.get_inputs())(
+            instrument(self.name + ':update_dashboard')(
+                self.update_dashboard))
+        # The export panel is reset, not rendered, on dropdown changes.
+        self.app.callback(
+            [Output('export-job', 'data'), Output('export-poll', 'disabled'),
+             Output('export-status', 'children')],
+            [Input('export-button', 'n_clicks'),
+             Input('export-poll', 'n_intervals')],
+            [State('export-job', 'data')] +
+            [State(i, 'value') for i in self.ids],
+            prevent_initial_call=True)(
+                instrument(self.name + ':update_export')(self.update_export))
+        self.engine.server.add_url_rule(
+            self.job_route + '<job_id>', self.name + ':export_job',
+            self.export_job)
+
+    def add_clientside_callbacks(self):
+        inputs = [Input(i, 'value') for i in self.ids]
+        # The trend and the projects need the server.
+        if self.trend:
+            self.app.callback(
+                Output('trend', 'figure'),
+                inputs + [Input('trend-range', 'value')],
+                prevent_initial_call=True)(
+                    instrument(self.name + ':update_trend')(
+                        self.update_trend))
+        if self.projects:
+            self.app.callback(
+                [Output('project-table', 'data'),
+                 Output('project-table', 'page_count')],
+                [Input(i, 'value') for i in self.project_ids] +
+                [Input('project-table', i) for i in table_props])(
+                    instrument(self.name + ':update_project_table')(
+                        self.update_project_table))
+        # The page polls until the blob, fetched in the background, is in.
+        self.app.clientside_callback(
+            ClientsideFunction('tracker', 'load_data'),
+            [Output('client-poll', 'disabled'),
+             Output('client-ready', 'data')],
+            [Input('client-poll', 'n_intervals')],
+            [State('client-spec', 'data')])
+        self.app.clientside_callback(
+            ClientsideFunction('tracker', 'update_dashboard'),
+            self.widget.get_outputs() +
+            [Output(i, 'options') for i in self.ids] +
+            [Output('table', 'data')],
+            inputs + [Input('client-ready', 'data')],
+            [State('client-spec', 'data')])
+        # The CSV is only built for a click, not for every change.
+        self.app.clientside_callback(
+            ClientsideFunction('tracker', 'export_csv'),
+            Output('export-url', 'href'),
+            [Input('export-button', 'n_clicks')],
+            [State(i, 'value') for i in self.ids] +
+            [State('client-spec', 'data')],
+            prevent_initial_call=True)
+        self.engine.server.add_url_rule(
+            self.client_route + '<digest>.json', self.name + ':client',
+            self.client_data)
+
+    def get_inputs(self):
+        """Inputs of update_dashboard, in the order of its arguments."""
+        inputs = [Input(i, 'value') for i in self.ids]
+        inputs += [Input(i, 'search_value') for i in self.searched]
+        inputs += [Input('table', i) for i in table_props]
+        if self.trend:
+            inputs.append(Input('trend-range', 'value'))
+        if self.projects:
+            inputs += [Input('project-table', i) for i in table_props]
+        return inputs
+
+    def get_outputs(self):
+        outputs = self.widget.get_outputs()
+        outputs += [Output(i, 'options') for i in self.ids]
+        outputs += [Output('table', 'data'), Output('table', 'page_count')]
+        if self.trend:
+            outputs.append(Output('trend', 'figure'))
+        if self.projects:
+            outputs += [Output('project-table', 'data'),
+                        Output('project-table', 'page_count')]
+        return outputs + [Output('export-panel', 'children')]
+
+    def get_export_panel(self):
+        return [html.Div(id='export-status'),
+                dcc.Interval(id='export-poll', interval=1000, disabled=True),
+                dcc.Store(id='export-job')]
+
+    def get_options(self, backend, facets, header, value=None, query=''):
+        if header in self.search:
+            return get_search_options(backend, header, query,
+                                      self.search_limit, value,
+                                      facets[header])
+        return get_facet_options(backend, header, facets[header], value)
+
+    def get_dropdown_options(self, backend, opts, queries, ids=None):
+        """Options of the dropdowns in ids (all if None), given opts."""
+        headers = [header for header, id in zip(self.headers, self.ids)
+                   if ids is None or id in ids]
+        facets = backend.get_facet_counts(self.get_selection(opts), headers)
+        return [self.get_options(backend, facets, header, opt,
+                                 queries.get(id) or '')
+                if ids is None or id in ids else dash.no_update
+                for header, id, opt in zip(self.headers, self.ids, opts)]
+
+    def get_trend(self, selection, days):
+        """Milestone completion over the last days (all if 0) of history."""
+        end = time.time()
+        start = end - days * 24 * 3600 if days else None
+        with phase('history'):
+            trend = self.source.history.get_trend(selection, start)
+        return get_trend_fig_dict(trend, self.widget.headers, start, end)
+
+    def get_project_page(self, projects, opts, page):
+        """A page of the rollup, of the selected projects if any."""
+        keys = None
+        if self.project_ids:
+            keys = opts[self.ids.index(self.project_ids[0])]
+        return list(projects.get_page(keys, *page))
+
+    def update_dashboard(self, *args):
+        triggered = [i['prop_id'] for i in dash.callback_context.triggered]
+        return self.update(triggered, *args)
+
+    def update(self, triggered, *args):
+        """Everything the triggered inputs change, from one snapshot.
+
+        A dropdown change updates every part of the page in this one
+        request. Typing in a searched dropdown, paging a table or picking
+        a trend range only updates that part; the rest is left as is.
+        triggered lists 'id.property' of the changed inputs, none for the
+        first call.
+        """
+        changed = [i.rsplit('.', 1) for i in triggered if i != '.']
+        ids = set(i[0] for i in changed)
+        values = set(id for id, prop in changed if prop == 'value')
+        selected = not changed or bool(values.intersection(self.ids))
+        searched = [id for id, prop in changed if prop == 'search_value']
+        n = len(self.ids)
+        args = list(args)
+        opts = args[:n]
+        queries = dict(zip(self.searched, args[n:n + len(self.searched)]))
+        args = args[n + len(self.searched):]
+        page, args = args[:4], args[4:]
+        data = self.source.dataset.current
+        backend = data.backend
+        selection = self.get_selection(opts)
+        skip = dash.no_update
+
+        if selected:
+            outputs = self.widget.get_values(
+                self.get_counts(backend, selection))
+        else:
+            outputs = [skip] * len(self.widget.get_outputs())
+        if selected or searched:
+            outputs += self.get_dropdown_options(
+                backend, opts, queries, None if selected else searched)
+        else:
+            outputs += [skip] * n
+        if selected or 'table' in ids:
+            outputs += list(backend.get_page(selection, *page))
+        else:
+            outputs += [skip, skip]
+        if self.trend:
+            days = args.pop(0)
+            if selected or 'trend-range' in ids:
+                outputs.append(self.get_trend(selection, days))
+            else:
+                outputs.append(skip)
+        if self.projects:
+            if (not changed or 'project-table' in ids or
+                    values.intersection(self.project_ids)):
+                outputs += self.get_project_page(data.projects, opts, args)
+            else:
+                outputs += [skip, skip]
+        # A new selection forgets the export, as it no longer matches.
+        outputs.append(self.get_export_panel() if changed and selected
+                       else skip)
+        return outputs
+
+    def get_client_spec(self):
+        digest = self.source.backend.get_client_data()[0]
+        return {'url': '{}{}.json'.format(self.client_route, digest),
+                'filters': self.headers, 'headers': self.widget.headers,
+                'widget': self.spec['widget'], 'export': self.spec['export']}
+
+    def client_data(self, digest):
+        """The encoded frame; immutable while its digest is current."""
+        current, data, gzipped = self.source.backend.get_client_data()
+        headers = {'ETag': '"{}"'.format(current), 'Vary': 'Accept-Encoding'}
+        if digest == current:
+            headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+        else:
+            # Asked for a reloaded-away version; send the current one.
+            headers['Cache-Control'] = 'no-cache'
+        if flask.request.if_none_match.contains(current):
+            return flask.Response(status=304, headers=headers)
+        if accepts_gzip():
+            data = gzipped
+            headers['Content-Encoding'] = 'gzip'
+        return flask.Response(data, mimetype='application/json',
+                              headers=headers)
+
+    def update_trend(self, *args):
+        opts, days = args[:-1], args[-1]
+        return self.get_trend(self.get_selection(opts), days)
+
+    def update_project_table(self, *args):
+        opts = [None] * len(self.ids)
+        if self.project_ids:
+            opts[self.ids.index(self.project_ids[0])] = args[0]
+        projects = self.source.dataset.current.projects
+        return self.get_project_page(projects, opts,
+                                     args[len(self.project_ids):])
+
+    def get_export_url(self, opts):
+        return get_export_url(self.export_route, self.ids, opts)
+
+    def update_export(self, *args):
+        triggered = [i['prop_id'] for i in dash.callback_context.triggered]
+        return self.export(triggered, *args)
+
+    def export(self, triggered, n_clicks, n_intervals, job_id, *opts):
+        """Start an export job on click, then poll it until it is done."""
+        if 'export-button.n_clicks' in triggered and n_clicks:
+            job_id = self.submit_export(opts)
+        elif 'export-poll.n_intervals' not in triggered:
+            job_id = None
+        if job_id is None:
+            return [None, True, '']
+        status = self.engine.exports.get_status(job_id)
+        # A job lost with its worker stops updating and goes stale.
+        if not self.engine.exports.is_live(status):
+            return [None, True, 'export failed, please retry']
+        if status['state'] != 'done':
+            pct = status['rows'] / float(max(status['total'], 1))
+            return [job_id, False, 'preparing csv {:.0%}'.format(pct)]
+        link = html.A('{} ({} rows)'.format(self.spec['export'],
+                                            status['rows']),
+                      href=self.job_route + job_id,
+                      download=self.spec['export'])
+        return [job_id, True, link]
+
+    def submit_export(self, opts):
+        data = self.source.dataset.current
+        backend = data.backend
+        selection = self.get_selection(opts)
+        # Jobs outlive the process and are shared by every checkout on
+        # the host, so they are keyed on the files, not on the version.
+        key = tuple((os.path.abspath(path), size, mtime)
+                    for path, size, mtime in data.signature)
+        key += get_filter_key(*[selection.get(i) for i in backend.filters])
+        return self.engine.exports.submit(
+            key, lambda: backend.iter_csv(selection, counts=True),
+            backend.get_count(selection))
+
+    def export_job(self, job_id):
+        return self.engine.exports.get_response(job_id, self.spec['export'])
+
+    def export_csv(self):
+        selection = self.get_selection(get_export_opts(self.ids))
+        return csv_response(self.source.backend.iter_csv(selection),
+                            self.spec['export'])
+
+
+class Engine(object):
+    """Hosts the dashboards of several specs on one Flask server.
+
+    With mount=True every dashboard lives under /<name>/ and / lists
+    them; otherwise the single dashboard is served at /.
+    """
+
+    def __init__(self, specs, mount=False, server=None,
+                 static_dir='static', max_cache_bytes=512 * 1024 ** 2):
+        if len(specs) > 1 and not mount:
+            raise ValueError('several dashboards need mount=True')
+        self.server = server or flask.Flask(__name__)
+        self.assets = AssetStore(os.path.realpath(static_dir))
+        init_app(self.server)
+        compress_responses(self.server)
+        self.assets.init_app(self.server)
+        self.result_cache = ResultCache(max_bytes=max_cache_bytes)
+        register_cache('results', self.result_cache)
+        self.exports = ExportJobs(
+            os.environ.get('TRACKER_EXPORT_DIR'),
+            max_workers=int(os.environ.get('TRACKER_EXPORT_WORKERS', 2)))
+
+        self.sources = {}
+        for spec in specs:
+            source = spec['source']
+            if source not in self.sources:
+                group = [i for i in specs if i['source'] == source]
+                self.sources[source] = Source(source, group,
+                                              self.result_cache)
+        self.dashboards = [
+            Dashboard(spec, self.sources[spec['source']], self,
+                      '/{}/'.format(spec['name']) if mount else '/')
+            for spec in specs]
+        if mount:
+            self.server.add_url_rule('/', 'tracker_index', self.serve_index)
+
+    def serve_index(self):
+        links = ''.join(
+            '<li><a href="/{0}/">{1}</a> ({0})</li>'.format(
+                i.name, i.spec['heading'])
+            for i in self.dashboards)
+        return '<!DOCTYPE html><title>Trackers</title><ul>{}</ul>'.format(
+            links)
+
+    def watch(self):
+        for source in self.sources.values():
+            source.dataset.watch()
@@ -0,0 +1,69 @@
+import zlib
+from urllib.parse import urlencode
+
+import flask
+
+from .metrics import count_bytes, phase
+
+
+def get_export_url(route, ids, opts):
+    query = [(i, str(value))
+             for i, opt in zip(ids, opts) for value in opt or []]
+    if not query:
+        return route
+    return route + '?' + urlencode(query)
+
+
+def get_export_opts(ids):
+    return [flask.request.args.getlist(i) for i in ids]
+
+
+def iter_csv(df, chunk_size=10000, rows=None, flags=(), counts=False):
+    """CSV text of the rows at positions rows (all if None), by chunks.
+
+    Only one chunk of rows is copied out of df at a time. Flags, stored
+    as booleans, are written as 0/1 like in the source CSV. With counts,
+    (text, rows in it) pairs are yielded instead.
+    """
+    flags = dict((i, int) for i in flags)
+    header = df.iloc[:0].to_csv(index=False)
+    yield (header, 0) if counts else header
+    size = len(df) if rows is None else len(rows)
+    for start in range(0, size, chunk_size):
+        with phase('csv', 'export'):
+            if rows is None:
+                chunk = df.iloc[start:start + chunk_size]
+            else:
+                chunk = df.iloc[rows[start:start + chunk_size]]
+            if flags:
+                chunk = chunk.astype(flags)
+            text = chunk.to_csv(index=False, header=False)
+        yield (text, len(chunk)) if counts else text
+
+
+def iter_gzip(chunks, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def accepts_gzip():
+    if flask.request.args.get('gzip') in ('1', 'true'):
+        return True
+    return 'gzip' in flask.request.headers.get('Accept-Encoding', '')
+
+
+def csv_response(chunks, filename):
+    """Stream CSV text chunks as a download, gzipped if accepted."""
+    headers = {'Content-Disposition': 'attachment; filename=' + filename}
+    if accepts_gzip():
+        chunks = iter_gzip(chunks)
+        headers['Content-Encoding'] = 'gzip'
+        headers['Vary'] = 'Accept-Encoding'
+    chunks = count_bytes(chunks, flask.request.path)
+    return flask.Response(
+        flask.stream_with_context(chunks),
+        mimetype='text/csv', headers=headers)
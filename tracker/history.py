@@ -0,0 +1,196 @@
+"""Append-only log of milestone aggregates, one entry per data version.
+
+An entry holds the milestone sums and row counts of every cube cell, one
+cell per combination of dropdown values, so a trend can be answered for
+any selection. Entries are delta-encoded: cells are named by ids given
+when they first appear, and only the cells whose counts changed since
+the previous entry are written, as differences. Every checkpoint_every
+entries a checkpoint writes all cells in full and renumbers them, so a
+reader replays from the last checkpoint before the range it needs
+rather than from the start of the log.
+
+Entries are JSON lines. A small fixed-width index file next to the log
+holds the time, offset and checkpoint flag of every entry; an entry is
+only visible once its index record is written.
+"""
+import fcntl
+import hashlib
+import json
+import os
+import struct
+
+import numpy as np
+
+record = struct.Struct('<dqB')
+index_dtype = np.dtype([('time', '<f8'), ('offset', '<i8'),
+                        ('checkpoint', 'u1')])
+
+
+def get_history_path(source, dims, headers, history_dir=None):
+    """The log of a source, named after it and its columns."""
+    if history_dir is None:
+        history_dir = os.path.join(os.path.dirname(source), '.history')
+    schema = repr((tuple(dims), tuple(headers)))
+    digest = hashlib.sha1(schema.encode('utf-8')).hexdigest()[:12]
+    name = os.path.basename(source).replace('*', '_')
+    return os.path.join(history_dir, '{}.{}.history'.format(name, digest))
+
+
+def get_label(value):
+    return None if value != value or value is None else str(value)
+
+
+class HistoryLog(object):
+    """Milestone aggregates of every version of a source over time.
+
+    dims are the filter headers and headers the milestone flags. Cells
+    are frames with a column per dim and header, plus 'rows', such as
+    MilestoneCube.cells.
+    """
+
+    def __init__(self, path, dims, headers, checkpoint_every=32):
+        self.path = path
+        self.index_path = path + '.idx'
+        self.dims = list(dims)
+        self.headers = list(headers)
+        self.checkpoint_every = checkpoint_every
+
+    def get_index(self):
+        if not os.path.exists(self.index_path):
+            return np.zeros(0, dtype=index_dtype)
+        with open(self.index_path, 'rb') as f:
+            data = f.read()
+        # A record cut short by a crash is not an entry yet.
+        size = len(data) // index_dtype.itemsize * index_dtype.itemsize
+        return np.frombuffer(data[:size], dtype=index_dtype)
+
+    def read_entries(self, index, start, stop):
+        with open(self.path, 'rb') as f:
+            for i in range(start, stop):
+                f.seek(int(index['offset'][i]))
+                yield float(index['time'][i]), json.loads(
+                    f.readline().decode('utf-8'))
+
+    def iter_states(self, start=None, end=None):
+        """Yield (time, keys, values) of the entries from start to end.
+
+        The last entry before start comes first, as the state at start.
+        keys lists the dim labels of each cell and values holds its
+        header sums and rows; values may change as later entries apply.
+        """
+        index = self.get_index()
+        if not len(index):
+            return
+        times = index['time']
+        first = 0 if start is None else max(
+            int(np.searchsorted(times, start, side='right')) - 1, 0)
+        stop = len(index) if end is None else int(
+            np.searchsorted(times, end, side='right'))
+        checkpoints = np.flatnonzero(index['checkpoint'][:first + 1])
+        replay = int(checkpoints[-1]) if len(checkpoints) else 0
+        keys = []
+        values = np.zeros((0, len(self.headers) + 1), dtype=np.int64)
+        for i, (time, entry) in enumerate(
+                self.read_entries(index, replay, stop), replay):
+            keys, values = self.apply(entry, keys, values)
+            if i >= first:
+                yield time, keys, values
+
+    def apply(self, entry, keys, values):
+        if entry['checkpoint']:
+            keys = []
+            values = np.zeros((0, values.shape[1]), dtype=np.int64)
+        if entry['new']:
+            keys = keys + [tuple(i) for i in entry['new']]
+            values = np.vstack([values, np.zeros(
+                (len(entry['new']), values.shape[1]), dtype=np.int64)])
+        if entry['cells']:
+            cells = np.array(entry['cells'], dtype=np.int64)
+            values[cells[:, 0]] += cells[:, 1:]
+        return keys, values
+
+    def get_last_state(self):
+        keys, values = [], None
+        for _, keys, values in self.iter_states(float('inf')):
+            pass
+        return keys, values
+
+    def split(self, cells):
+        keys = [tuple(get_label(i) for i in row)
+                for row in cells[self.dims].itertuples(index=False)]
+        return keys, cells[self.headers + ['rows']].values.astype(np.int64)
+
+    def get_entry(self, keys, values, new_keys, new_values):
+        """The delta from one state to the next; None if they are equal."""
+        if values is None:
+            values = np.zeros((0, new_values.shape[1]), dtype=np.int64)
+        ids = dict((key, i) for i, key in enumerate(keys))
+        new = [key for key in new_keys if key not in ids]
+        for key in new:
+            ids[key] = len(ids)
+        delta = np.zeros((len(ids), values.shape[1]), dtype=np.int64)
+        delta[[ids[key] for key in new_keys]] = new_values
+        delta[:len(values)] -= values
+        changed = np.flatnonzero(delta.any(axis=1))
+        if not new and not len(changed):
+            return None
+        return {'checkpoint': False, 'new': new,
+                'cells': [[int(i)] + delta[i].tolist() for i in changed]}
+
+    def append(self, time, cells):
+        """Log the cells of a version from time, unless already logged.
+
+        Workers reloading the same file each try; a lock on the log and
+        the time check let only the first one write.
+        """
+        log_dir = os.path.dirname(self.path)
+        if log_dir and not os.path.isdir(log_dir):
+            os.makedirs(log_dir)
+        with open(self.path, 'ab') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                index = self.get_index()
+                if len(index) and index['time'][-1] >= time:
+                    return False
+                new_keys, new_values = self.split(cells)
+                keys, values = self.get_last_state()
+                entry = self.get_entry(keys, values, new_keys, new_values)
+                if entry is None:
+                    return False
+                if len(index) % self.checkpoint_every == 0:
+                    entry = {'checkpoint': True, 'new': new_keys,
+                             'cells': [[i] + row for i, row in
+                                       enumerate(new_values.tolist())]}
+                offset = f.seek(0, os.SEEK_END)
+                f.write((json.dumps(entry, separators=(',', ':')) +
+                         '\n').encode('utf-8'))
+                f.flush()
+                with open(self.index_path, 'ab') as index_file:
+                    # Drop a partial record left by a crash first.
+                    index_file.truncate(len(index) * index_dtype.itemsize)
+                    index_file.write(record.pack(time, offset,
+                                                 entry['checkpoint']))
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+        return True
+
+    def get_trend(self, selection, start=None, end=None):
+        """(time, {header: (complete, waiting)}) of every entry in range.
+
+        selection maps dims to their selected values, as for backends.
+        """
+        trend = []
+        for time, keys, values in self.iter_states(start, end):
+            mask = np.ones(len(keys), dtype=bool)
+            for i, dim in enumerate(self.dims):
+                opt = selection.get(dim)
+                if opt:
+                    wanted = set(str(j) for j in opt)
+                    mask &= np.array([key[i] in wanted for key in keys],
+                                     dtype=bool)
+            sums = values[mask].sum(axis=0)
+            rows = int(sums[-1])
+            trend.append((time, dict(
+                (header, (int(yes), rows - int(yes)))
+                for header, yes in zip(self.headers, sums[:-1]))))
+        return trend
@@ -0,0 +1,203 @@
+import copy
+
+import numpy as np
+import pandas as pd
+
+
+def concat_bits(bits, size, other, other_size):
+    full, rest = divmod(size, 8)
+    tail = np.unpackbits(bits[full:])[:rest]
+    other = np.unpackbits(other)[:other_size]
+    joined = np.packbits(np.concatenate([tail, other]))
+    return np.concatenate([bits[:full], joined])
+
+
+def get_recoded(codes, labels, positions):
+    """Codes into labels mapped to codes into the labels of positions."""
+    lookup = np.array([positions[i] for i in labels] + [-1], dtype=np.int32)
+    return lookup[codes]
+
+
+def get_faceted(filters, selection, headers=None):
+    """Those of headers (default all filters) that need their facets
+    counted: the ones with another filter selected. The others count all
+    rows, as the option indexes already have them.
+    """
+    return [header for header in (filters if headers is None else headers)
+            if any(selection.get(i) for i in filters if i != header)]
+
+
+class FilterIndex(object):
+    """Row masks for every value of every dropdown column.
+
+    Selections are OR-ed within a column and AND-ed across columns. The
+    label codes of every row are kept, and a column's mask is looked up
+    from them through a table of the selected codes. Columns with at
+    most max_bitmaps labels also keep a packed row bitmap per label,
+    which is faster to combine and takes no more memory than the codes;
+    wider columns, such as titles, would need one bitmap per label.
+    """
+
+    def __init__(self, df, headers, max_bitmaps=32):
+        self.headers = list(headers)
+        self.size = len(df)
+        self.max_bitmaps = max_bitmaps
+        self.labels = {}
+        self.positions = {}
+        self.bitmaps = {}
+        self.counts = {}
+        self.codes = {}
+        for header in self.headers:
+            column = df[header]
+            if column.dtype.name == 'category':
+                codes = column.cat.codes.values
+                labels = [str(i) for i in column.cat.categories]
+            else:
+                codes, labels = pd.factorize(column.astype(str), sort=True)
+                labels = list(labels)
+            self.set_labels(header, labels)
+            self.codes[header] = codes.astype(np.int32)
+            counts = np.bincount(codes[codes >= 0], minlength=len(labels))
+            self.counts[header] = dict(zip(labels, counts.tolist()))
+            if len(labels) <= max_bitmaps:
+                self.bitmaps[header] = dict(
+                    (label, np.packbits(codes == i))
+                    for i, label in enumerate(labels))
+
+    def set_labels(self, header, labels):
+        self.labels[header] = labels
+        self.positions[header] = dict(
+            (label, i) for i, label in enumerate(labels))
+
+    def extend(self, df):
+        """Return an index over df, whose leading rows are this index's."""
+        delta = FilterIndex(df.iloc[self.size:], self.headers,
+                            self.max_bitmaps)
+        index = copy.copy(self)
+        index.size = len(df)
+        index.labels = {}
+        index.positions = {}
+        index.bitmaps = {}
+        index.counts = {}
+        index.codes = {}
+        for header in self.headers:
+            if df[header].dtype.name == 'category':
+                labels = [str(i) for i in df[header].cat.categories]
+            else:
+                labels = sorted(set(self.labels[header]) |
+                                set(delta.labels[header]))
+            index.set_labels(header, labels)
+            positions = index.positions[header]
+            codes = self.codes[header]
+            if labels != self.labels[header]:
+                codes = get_recoded(codes, self.labels[header], positions)
+            index.codes[header] = np.concatenate([
+                codes, get_recoded(delta.codes[header],
+                                   delta.labels[header], positions)])
+            index.counts[header] = dict(
+                (label, self.counts[header].get(label, 0) +
+                 delta.counts[header].get(label, 0))
+                for label in labels)
+            if header in self.bitmaps and len(labels) <= self.max_bitmaps:
+                empty = np.zeros((self.size + 7) // 8, dtype=np.uint8)
+                empty_delta = np.zeros((delta.size + 7) // 8,
+                                       dtype=np.uint8)
+                index.bitmaps[header] = dict(
+                    (label, concat_bits(
+                        self.bitmaps[header].get(label, empty), self.size,
+                        delta.bitmaps[header].get(label, empty_delta),
+                        delta.size))
+                    for label in labels)
+        return index
+
+    def get_options(self, header):
+        return [{'label': i, 'value': i} for i in self.labels[header]]
+
+    def get_counts(self, header):
+        """Row counts in the order of the header's labels."""
+        counts = self.counts[header]
+        return [counts.get(i, 0) for i in self.labels[header]]
+
+    def get_column_bits(self, header, opt):
+        column = self.bitmaps[header]
+        bits = np.zeros((self.size + 7) // 8, dtype=np.uint8)
+        for value in set(str(i) for i in opt):
+            if value in column:
+                bits |= column[value]
+        return bits
+
+    def get_column_mask(self, header, opt):
+        if header in self.bitmaps:
+            bits = self.get_column_bits(header, opt)
+            return np.unpackbits(bits)[:self.size].astype(bool)
+        positions = self.positions[header]
+        # The extra last entry is for the -1 code of missing values.
+        keep = np.zeros(len(positions) + 1, dtype=bool)
+        keep[[positions[i] for i in set(str(j) for j in opt)
+              if i in positions]] = True
+        return keep[self.codes[header]]
+
+    def get_mask(self, *opts):
+        bits = None
+        mask = None
+        for header, opt in zip(self.headers, opts):
+            if not opt:
+                continue
+            if header in self.bitmaps:
+                col_bits = self.get_column_bits(header, opt)
+                if bits is None:
+                    bits = col_bits
+                else:
+                    bits &= col_bits
+                continue
+            col_mask = self.get_column_mask(header, opt)
+            if mask is None:
+                mask = col_mask
+            else:
+                mask &= col_mask
+        if bits is not None:
+            bits = np.unpackbits(bits)[:self.size].astype(bool)
+            mask = bits if mask is None else mask & bits
+        return mask
+
+    def get_facet_counts(self, opts, weights=None, headers=None):
+        """Row counts of every label under the other headers' selections.
+
+        A row counts for a header when it fails no selection but possibly
+        that header's own, so every header is counted off one pass that
+        records how many selections each row fails. With weights, each
+        row counts its weight, e.g. the rows of a cube cell. Only headers
+        (default all) are counted.
+        """
+        fails = np.zeros(self.size, dtype=np.int32)
+        misses = {}
+        for header, opt in zip(self.headers, opts):
+            if opt:
+                misses[header] = ~self.get_column_mask(header, opt)
+                fails += misses[header]
+        matched = fails == 0
+        facets = {}
+        for header in self.headers if headers is None else headers:
+            rows = matched
+            if header in misses:
+                rows = matched | ((fails == 1) & misses[header])
+            codes = self.codes[header]
+            rows = rows & (codes >= 0)
+            counts = np.bincount(
+                codes[rows], None if weights is None else weights[rows],
+                minlength=len(self.labels[header]))
+            facets[header] = dict(zip(self.labels[header],
+                                      counts.astype(np.int64).tolist()))
+        return facets
+
+    def get_rows(self, *opts):
+        mask = self.get_mask(*opts)
+        if mask is None:
+            return np.arange(self.size)
+        return np.flatnonzero(mask)
+
+    def select(self, df, *opts):
+        mask = self.get_mask(*opts)
+        if mask is None:
+            return df
+        return df[mask]
@@ -0,0 +1,154 @@
+import fcntl
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import flask
+
+from .export import accepts_gzip
+from .metrics import count_bytes
+
+logger = logging.getLogger(__name__)
+
+
+def iter_file(path, chunk_size=64 * 1024, decompress=False):
+    with (gzip.open if decompress else open)(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+class ExportJobs(object):
+    """Writes CSV exports to gzipped files in a thread pool.
+
+    A job is named by a hash of its key, which callers build from the
+    data files and the selection, so identical requests share one job.
+    Its status lives in a JSON file next to the output, and a lock file
+    lets only one worker start it; under gunicorn a worker polling for a
+    job another worker started reads the same files.
+    Files older than max_age seconds are removed as new jobs come in.
+    """
+
+    def __init__(self, directory=None, max_workers=2, max_age=3600,
+                 level=6, stale_after=300):
+        if directory is None:
+            directory = os.path.join(tempfile.gettempdir(), 'tracker-exports')
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.directory = directory
+        self.max_age = max_age
+        self.level = level
+        self.stale_after = stale_after
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def get_job_id(self, key):
+        return hashlib.sha1(repr(key).encode('utf-8')).hexdigest()[:20]
+
+    def get_path(self, job_id, ext='csv.gz'):
+        if not re.match('^[0-9a-f]+$', job_id):
+            raise ValueError('bad job id: {!r}'.format(job_id))
+        return os.path.join(self.directory, '{}.{}'.format(job_id, ext))
+
+    def get_status(self, job_id):
+        path = self.get_path(job_id, 'json')
+        try:
+            with open(path) as f:
+                status = json.load(f)
+            status['age'] = time.time() - os.path.getmtime(path)
+        except (OSError, ValueError):
+            return None
+        if (status['state'] == 'done' and
+                not os.path.exists(self.get_path(job_id))):
+            return None
+        return status
+
+    def set_status(self, job_id, **status):
+        path = self.get_path(job_id, 'json')
+        tmp_path = '{}.{}.{}.tmp'.format(path, os.getpid(),
+                                         threading.current_thread().ident)
+        with open(tmp_path, 'w') as f:
+            json.dump(status, f)
+        os.rename(tmp_path, path)
+
+    def is_live(self, status):
+        if status is None or status['state'] == 'failed':
+            return False
+        return status['state'] == 'done' or status['age'] < self.stale_after
+
+    def submit(self, key, get_chunks, total):
+        """Start a job writing get_chunks() unless one is live for key.
+
+        get_chunks() yields (CSV text, rows in it) pairs, as quoted
+        values may span lines.
+        """
+        job_id = self.get_job_id(key)
+        # Held across workers as well as threads, so one starts the job.
+        with open(self.get_path(job_id, 'lock'), 'ab') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                if not self.is_live(self.get_status(job_id)):
+                    self.set_status(job_id, state='queued', rows=0,
+                                    total=total)
+                    self.executor.submit(self.run, job_id, get_chunks,
+                                         total)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+        self.cleanup()
+        return job_id
+
+    def run(self, job_id, get_chunks, total):
+        path = self.get_path(job_id)
+        part_path = '{}.{}.part'.format(path, os.getpid())
+        rows = 0
+        try:
+            with gzip.open(part_path, 'wb', self.level) as f:
+                for chunk, size in get_chunks():
+                    f.write(chunk.encode('utf-8'))
+                    rows += size
+                    self.set_status(job_id, state='running', rows=rows,
+                                    total=total)
+            os.rename(part_path, path)
+            self.set_status(job_id, state='done', rows=rows, total=total)
+        except Exception as e:
+            logger.exception('export %s failed', job_id)
+            self.set_status(job_id, state='failed', rows=0, total=total,
+                            error=str(e))
+            if os.path.exists(part_path):
+                os.remove(part_path)
+
+    def cleanup(self):
+        cutoff = time.time() - self.max_age
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def get_response(self, job_id, filename):
+        try:
+            path = self.get_path(job_id)
+        except ValueError:
+            flask.abort(404)
+        if not os.path.exists(path):
+            flask.abort(404)
+        headers = {'Content-Disposition': 'attachment; filename=' + filename,
+                   'Vary': 'Accept-Encoding'}
+        if accepts_gzip():
+            chunks = iter_file(path)
+            headers['Content-Encoding'] = 'gzip'
+            headers['Content-Length'] = str(os.path.getsize(path))
+        else:
+            chunks = iter_file(path, decompress=True)
+        chunks = count_bytes(chunks, flask.request.path)
+        return flask.Response(chunks, mimetype='text/csv', headers=headers)
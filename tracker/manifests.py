@@ -0,0 +1,273 @@
+"""Consolidate every release of a manifest into one dataset.
+
+Manifests are named <timestamp>-<name>.csv and each release lists the
+files known at the time, so a file id may appear in many of them. The
+merged dataset keeps each id once, as the newest manifest has it, with
+the newest manifest's rows first.
+
+Parsing is the slow part, so each manifest is streamed a chunk at a time
+into its own Arrow IPC (Feather) cache, keyed like load_csv's; a new
+release only parses the new file. Several are parsed at once by
+separate interpreters (python -m tracker.manifests), never by forks of
+the app, and under a lock in the cache directory, so processes loading
+the same release parse it once. The merge then reads the caches newest
+first, a slice at a time, and drops ids already seen, so beyond its
+output it holds one slice and the hashes of the ids.
+"""
+import argparse
+import fcntl
+import glob
+import hashlib
+import logging
+import os
+import re
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .sqlite import write_database
+from .store import (compact, feather, get_cache_path, load_cached,
+                    replace_cache)
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+release_name = re.compile(r'^\d+-')
+skipped = set()
+
+
+def get_timestamp(path):
+    return int(os.path.basename(path).split('-')[0])
+
+
+def get_releases(pattern):
+    """Files matching pattern named <timestamp>-..., oldest first.
+
+    Other matches, like old-manifest.csv, are skipped, and logged the
+    first time they are seen rather than on every look.
+    """
+    paths = []
+    for path in glob.glob(pattern):
+        if release_name.match(os.path.basename(path)):
+            paths.append(path)
+        elif path not in skipped:
+            skipped.add(path)
+            logger.warning('skipping %s: its name has no timestamp', path)
+    return sorted(paths, key=get_timestamp)
+
+
+def get_merged_path(paths, cache_dir=None, schema=(), ext='feather'):
+    """Cache path of the merge of paths, keyed on all of their versions."""
+    newest = max(paths, key=get_timestamp)
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(newest), '.cache')
+    versions = []
+    for path in sorted(paths):
+        stat = os.stat(path)
+        versions.append((os.path.abspath(path), stat.st_size, stat.st_mtime))
+    key = '{!r}:{!r}'.format(versions, schema)
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+    name = 'merged-' + os.path.basename(newest).split('-', 1)[1]
+    return os.path.join(cache_dir, '{}.{}.{}'.format(name, digest, ext))
+
+
+class SchemaError(ValueError):
+    """A chunk has columns that cannot take the first chunk's types."""
+
+    def __init__(self, columns):
+        ValueError.__init__(self, 'cannot cast columns {}'.format(columns))
+        self.columns = columns
+
+
+def write_chunks(chunks, path):
+    """Stream frame chunks into one Arrow IPC file, typed as the first."""
+    writer = None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                schema = table.schema
+                writer = pa.ipc.new_file(path, schema)
+            elif not table.schema.equals(schema):
+                bad = []
+                for field in schema:
+                    column = table.column(field.name)
+                    try:
+                        column.cast(field.type)
+                    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                        bad.append(field.name)
+                if bad:
+                    raise SchemaError(bad)
+                table = table.cast(schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+    return writer is not None
+
+
+def parse_manifest(path, cache_path, chunk_size=100000):
+    """Parse a manifest into its cache, holding one chunk at a time.
+
+    Columns take the types of the first chunk. One that a later chunk
+    cannot be cast to, like numbers followed by text, is parsed again as
+    text from the start.
+    """
+    text = {}
+    while True:
+        def write(tmp_path):
+            chunks = pd.read_csv(path, chunksize=chunk_size, dtype=text)
+            if not write_chunks(chunks, tmp_path):
+                feather.write_feather(pd.read_csv(path, nrows=0), tmp_path,
+                                      compression='uncompressed')
+        try:
+            replace_cache(cache_path, write)
+            return cache_path
+        except SchemaError as e:
+            text.update((i, str) for i in e.columns)
+
+
+def get_command(path, cache_path, chunk_size):
+    return [sys.executable, '-m', __name__, path, cache_path,
+            '--chunk-size', str(chunk_size)]
+
+
+def parse_manifests(paths, cache_dir=None, max_workers=None,
+                    chunk_size=100000):
+    """Feather caches of the manifests, parsing missing ones in parallel.
+
+    Each missing manifest is parsed by its own interpreter, at most
+    max_workers (default one per CPU) at a time. A spawned pool would
+    re-import the main module, and the scripts build their apps there.
+    """
+    cache_paths = [get_cache_path(i, cache_dir, ('manifest',))
+                   for i in paths]
+    missing = [(path, cache_path)
+               for path, cache_path in zip(paths, cache_paths)
+               if not os.path.exists(cache_path)]
+    if not missing:
+        return cache_paths
+    lock_dir = os.path.dirname(missing[0][1])
+    if not os.path.isdir(lock_dir):
+        os.makedirs(lock_dir)
+    with open(os.path.join(lock_dir, 'manifests.lock'), 'ab') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            # Whoever held the lock may have parsed them meanwhile.
+            missing = [i for i in missing if not os.path.exists(i[1])]
+            if len(missing) > 1 and max_workers != 1:
+                # The package may not be importable from the child's cwd.
+                root = os.path.dirname(os.path.dirname(
+                    os.path.abspath(__file__)))
+                env = dict(os.environ)
+                env['PYTHONPATH'] = os.pathsep.join(
+                    [root] + [i for i in [env.get('PYTHONPATH')] if i])
+                with ThreadPoolExecutor(
+                        max_workers or os.cpu_count() or 1) as pool:
+                    list(pool.map(
+                        lambda i: subprocess.check_call(
+                            get_command(i[0], i[1], chunk_size), env=env),
+                        missing))
+            else:
+                for path, cache_path in missing:
+                    parse_manifest(path, cache_path, chunk_size)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+    return cache_paths
+
+
+def iter_cache(cache_path, chunk_size=100000):
+    table = feather.read_table(cache_path, memory_map=True)
+    for start in range(0, table.num_rows, chunk_size):
+        yield table.slice(start, chunk_size).to_pandas()
+
+
+def iter_merged(paths, key, cache_dir=None, max_workers=None,
+                chunk_size=100000):
+    """Yield the rows of the manifests newest first, each id only once.
+
+    Within a manifest the first row of an id wins. Columns are the newest
+    manifest's; older manifests missing one of them leave it empty.
+    """
+    paths = sorted(paths, key=get_timestamp, reverse=True)
+    if feather is None:
+        manifests = (pd.read_csv(i, chunksize=chunk_size) for i in paths)
+    else:
+        manifests = (iter_cache(i, chunk_size) for i in parse_manifests(
+            paths, cache_dir, max_workers, chunk_size))
+    seen = np.zeros(0, dtype=np.uint64)
+    columns = None
+    for chunks in manifests:
+        for chunk in chunks:
+            if columns is None:
+                columns = list(chunk.columns)
+            elif list(chunk.columns) != columns:
+                chunk = chunk.reindex(columns=columns)
+            ids = pd.util.hash_array(chunk[key].astype(str).values)
+            keep = np.zeros(len(ids), dtype=bool)
+            keep[np.unique(ids, return_index=True)[1]] = True
+            if len(seen):
+                found = np.searchsorted(seen, ids)
+                keep &= seen[np.minimum(found, len(seen) - 1)] != ids
+            if not keep.all():
+                chunk = chunk[keep]
+                ids = ids[keep]
+            if len(chunk):
+                # Both runs are sorted, so the stable sort merges them.
+                seen = np.sort(np.concatenate([seen, np.sort(ids)]),
+                               kind='stable')
+                yield chunk
+
+
+def load_merged(paths, key, categories=(), flags=(), cache_dir=None,
+                max_workers=None, chunk_size=100000):
+    """The merged manifests as one frame, cached like load_csv.
+
+    The cache is keyed on the version of every manifest and
+    memory-mapped by later loads.
+    """
+    def build():
+        chunks = iter_merged(paths, key, cache_dir, max_workers, chunk_size)
+        return compact(pd.concat(list(chunks), ignore_index=True),
+                       categories, flags)
+    if feather is None:
+        return build()
+    schema = (key, tuple(categories), tuple(flags))
+    return load_cached(get_merged_path(paths, cache_dir, schema), build)
+
+
+def ingest_merged(paths, key, filters=(), flags=(), distinct=(),
+                  cache_dir=None, max_workers=None, chunk_size=100000):
+    """The merged manifests as an indexed SQLite file, like ingest.
+
+    Rows are streamed from the merge into the database, so the merged
+    frame is never held in memory.
+    """
+    schema = (key, tuple(filters), tuple(flags), tuple(distinct))
+    db_path = get_merged_path(paths, cache_dir, schema, ext='sqlite')
+    if not os.path.exists(db_path):
+        write_database(
+            iter_merged(paths, key, cache_dir, max_workers, chunk_size),
+            db_path, filters, flags, distinct)
+    return db_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Parse a manifest into its Feather cache.')
+    parser.add_argument('path')
+    parser.add_argument('cache_path')
+    parser.add_argument('--chunk-size', type=int, default=100000)
+    args = parser.parse_args(argv)
+    parse_manifest(args.path, args.cache_path, args.chunk_size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,366 @@
+"""Callback latency/payload histograms, cache counters and a profiler.
+
+Metrics are kept per process. With a metrics directory (the
+TRACKER_METRICS_DIR variable, which gunicorn.conf.py sets), every process
+also writes its numbers there each flush_interval seconds, and /metrics
+sums those of all workers, whichever worker is scraped. The counters of
+finished workers are folded into an archive by the master so totals never
+go back; their cache gauges are dropped.
+"""
+import bisect
+import collections
+import contextlib
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import timeit
+
+import flask
+
+time_buckets = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1.0, 2.5,
+                5.0, 10.0)
+size_buckets = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304,
+                16777216, 67108864)
+
+flush_interval = 1.0
+
+local = threading.local()
+metrics_dir = None
+
+
+def format_labels(labels):
+    return ','.join('{}="{}"'.format(k, str(v).replace('"', '\\"'))
+                    for k, v in labels)
+
+
+class Histogram(object):
+
+    def __init__(self, name, help, buckets):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        i = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [0] * len(self.buckets) + [0, 0]
+            if i < len(self.buckets):
+                series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def get_series(self):
+        with self.lock:
+            return [[[list(i) for i in k], list(v)]
+                    for k, v in self.series.items()]
+
+    def render(self, items):
+        """Exposition lines of items, a dict of label pairs to counts."""
+        lines = ['# HELP {} {}'.format(self.name, self.help),
+                 '# TYPE {} histogram'.format(self.name)]
+        for labels, series in sorted(items.items()):
+            total = 0
+            for le, count in zip(self.buckets, series):
+                total += count
+                lines.append('{}_bucket{{{},le="{}"}} {}'.format(
+                    self.name, format_labels(labels), le, total))
+            lines.append('{}_bucket{{{},le="+Inf"}} {}'.format(
+                self.name, format_labels(labels), series[-1]))
+            lines.append('{}_sum{{{}}} {}'.format(
+                self.name, format_labels(labels), series[-2]))
+            lines.append('{}_count{{{}}} {}'.format(
+                self.name, format_labels(labels), series[-1]))
+        return lines
+
+
+callback_seconds = Histogram(
+    'tracker_callback_seconds', 'Time spent inside a Dash callback.',
+    time_buckets)
+phase_seconds = Histogram(
+    'tracker_phase_seconds', 'Time spent in a phase of a callback.',
+    time_buckets)
+request_seconds = Histogram(
+    'tracker_request_seconds',
+    'Time to answer a callback request, including serialization.',
+    time_buckets)
+response_bytes = Histogram(
+    'tracker_response_bytes', 'Size of callback and export responses.',
+    size_buckets)
+histograms = [callback_seconds, phase_seconds, request_seconds,
+              response_bytes]
+caches = {}
+
+
+def instrument(name):
+    """Record the duration of a callback; phases inside it are tagged."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            outer = getattr(local, 'callback', None)
+            local.callback = name
+            start = timeit.default_timer()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                callback_seconds.observe(
+                    timeit.default_timer() - start, callback=name)
+                local.callback = outer
+        return wrapper
+    return decorator
+
+
+@contextlib.contextmanager
+def phase(name, callback=None):
+    callback = callback or getattr(local, 'callback', None) or 'none'
+    start = timeit.default_timer()
+    try:
+        yield
+    finally:
+        phase_seconds.observe(
+            timeit.default_timer() - start, phase=name, callback=callback)
+
+
+def register_cache(name, cache):
+    caches[name] = cache
+
+
+cache_metrics = [('tracker_cache_hits_total', 'counter'),
+                 ('tracker_cache_misses_total', 'counter'),
+                 ('tracker_cache_bytes', 'gauge'),
+                 ('tracker_cache_entries', 'gauge')]
+
+
+def render_caches(values):
+    lines = []
+    for i, (metric, kind) in enumerate(cache_metrics):
+        lines.append('# TYPE {} {}'.format(metric, kind))
+        for name, counts in sorted(values.items()):
+            lines.append('{}{{{}}} {}'.format(
+                metric, format_labels([('cache', name)]), counts[i]))
+    return lines
+
+
+def get_state():
+    """This process's numbers, as JSON-ready lists."""
+    return {'histograms': dict((i.name, i.get_series()) for i in histograms),
+            'caches': dict((name, [cache.hits, cache.misses, cache.nbytes,
+                                   len(cache.entries)])
+                           for name, cache in caches.items())}
+
+
+def merge_states(states):
+    """Sum (state, live) pairs; gauges only count live processes."""
+    merged = {'histograms': {}, 'caches': {}}
+    for state, live in states:
+        for name, items in state.get('histograms', {}).items():
+            series = merged['histograms'].setdefault(name, {})
+            for key, counts in items:
+                key = tuple(tuple(i) for i in key)
+                total = series.setdefault(key, [0] * len(counts))
+                for i, count in enumerate(counts):
+                    total[i] += count
+        for name, counts in state.get('caches', {}).items():
+            total = merged['caches'].setdefault(name, [0] * len(counts))
+            for i, count in enumerate(counts[:None if live else 2]):
+                total[i] += count
+    return merged
+
+
+def get_state_path(name):
+    return os.path.join(metrics_dir, '{}.json'.format(name))
+
+
+def read_state(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_state(state, path):
+    tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, separators=(',', ':'))
+    os.rename(tmp_path, path)
+
+
+def read_states():
+    """(state, live) of every other process in the metrics directory."""
+    own = get_state_path(os.getpid())
+    for name in os.listdir(metrics_dir):
+        path = os.path.join(metrics_dir, name)
+        if not name.endswith('.json') or path == own:
+            continue
+        state = read_state(path)
+        if state is not None:
+            yield state, name != 'archive.json'
+
+
+def flush():
+    if metrics_dir is not None:
+        write_state(get_state(), get_state_path(os.getpid()))
+
+
+def run_flusher():
+    while True:
+        time.sleep(flush_interval)
+        try:
+            flush()
+        except OSError:
+            pass
+
+
+def start_flusher():
+    """Flush this process's numbers periodically, from a thread.
+
+    Meant for forked workers (see post_fork in gunicorn.conf.py); a
+    thread in the master could hold a lock across a fork.
+    """
+    if metrics_dir is None:
+        return None
+    thread = threading.Thread(target=run_flusher)
+    thread.daemon = True
+    thread.start()
+    return thread
+
+
+def clear(directory):
+    """Remove the numbers of an earlier run from a metrics directory."""
+    for name in os.listdir(directory) if os.path.isdir(directory) else ():
+        if name.endswith(('.json', '.tmp')):
+            os.remove(os.path.join(directory, name))
+
+
+def mark_dead(pid):
+    """Fold the counters of a finished process into the archive.
+
+    Called by the master as workers exit, so the directory holds one file
+    per live worker plus the archive.
+    """
+    if metrics_dir is None:
+        return
+    path = get_state_path(pid)
+    state = read_state(path)
+    if state is None:
+        return
+    archive_path = get_state_path('archive')
+    archive = read_state(archive_path) or {}
+    merged = merge_states([(archive, True), (state, False)])
+    merged['histograms'] = dict(
+        (name, [[[list(i) for i in k], v] for k, v in series.items()])
+        for name, series in merged['histograms'].items())
+    write_state(merged, archive_path)
+    os.remove(path)
+
+
+def render():
+    states = [(get_state(), True)]
+    if metrics_dir is not None:
+        states.extend(read_states())
+    merged = merge_states(states)
+    lines = []
+    for histogram in histograms:
+        lines.extend(histogram.render(
+            merged['histograms'].get(histogram.name, {})))
+    lines.extend(render_caches(merged['caches']))
+    return '\n'.join(lines) + '\n'
+
+
+def get_output_label():
+    body = flask.request.get_json(silent=True) or {}
+    return str(body.get('output', 'unknown')).strip('.')[:200]
+
+
+def before_request():
+    flask.g.tracker_start = timeit.default_timer()
+
+
+def after_request(response):
+    start = getattr(flask.g, 'tracker_start', None)
+    if start is None:
+        return response
+    path = flask.request.path
+    if path.endswith('/_dash-update-component'):
+        output = get_output_label()
+        request_seconds.observe(
+            timeit.default_timer() - start, output=output)
+        if not response.is_streamed:
+            response_bytes.observe(
+                response.calculate_content_length() or 0, route=output)
+    return response
+
+
+def count_bytes(chunks, route):
+    """Pass a streamed body through, recording its size when it ends."""
+    nbytes = 0
+    for chunk in chunks:
+        nbytes += len(chunk)
+        yield chunk
+    response_bytes.observe(nbytes, route=route)
+
+
+profile_lock = threading.Lock()
+
+
+def sample_stacks(seconds, interval):
+    """Collapsed stacks of every other thread, flamegraph.pl format."""
+    stacks = collections.Counter()
+    me = threading.current_thread().ident
+    end = timeit.default_timer() + seconds
+    while timeit.default_timer() < end:
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append('{}:{}'.format(
+                    os.path.basename(code.co_filename), code.co_name))
+                frame = frame.f_back
+            stacks[';'.join(reversed(stack))] += 1
+        threading.Event().wait(interval)
+    return ''.join('{} {}\n'.format(k, v) for k, v in stacks.most_common())
+
+
+def profile():
+    seconds = min(float(flask.request.args.get('seconds', 10)), 120)
+    interval = max(float(flask.request.args.get('interval', .005)), .001)
+    if not profile_lock.acquire(False):
+        return flask.Response('profile already running\n', status=409,
+                              mimetype='text/plain')
+    try:
+        return flask.Response(sample_stacks(seconds, interval),
+                              mimetype='text/plain')
+    finally:
+        profile_lock.release()
+
+
+def init_app(server, profiler=None):
+    """Add /metrics, the request hooks and, opt-in, /debug/profile.
+
+    The profiler is enabled by profiler=True or TRACKER_PROFILER=1.
+    """
+    global metrics_dir
+    if 'tracker_metrics' in server.view_functions:
+        return
+    metrics_dir = os.environ.get('TRACKER_METRICS_DIR') or None
+    if metrics_dir is not None and not os.path.isdir(metrics_dir):
+        os.makedirs(metrics_dir)
+    server.before_request(before_request)
+    server.after_request(after_request)
+    server.add_url_rule(
+        '/metrics', 'tracker_metrics',
+        lambda: flask.Response(render(), mimetype='text/plain; version=0.0.4'))
+    if profiler is None:
+        profiler = os.environ.get('TRACKER_PROFILER') == '1'
+    if profiler:
+        server.add_url_rule('/debug/profile', 'tracker_profile', profile)
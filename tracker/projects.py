@@ -0,0 +1,113 @@
+import copy
+
+import numpy as np
+import pandas as pd
+
+from .table import TablePager
+
+
+class ProjectRollup(object):
+    """Milestone totals and completion of every project.
+
+    Samples are joined to the projects frame through a key index, the
+    project position of every key value, and their flags are summed per
+    project with one bincount. An appended snapshot only adds the sums of
+    its new rows. Keys without a project row get a row of their own, so
+    every sample is counted somewhere.
+
+    The rollup table is rebuilt when rows are added, not per request, and
+    its pages are sorted and filtered on the server like the sample
+    table's.
+    """
+
+    def __init__(self, df_project, key, milestones):
+        df_project = df_project.copy()
+        df_project[key] = df_project[key].astype(str)
+        self.df_project = df_project.drop_duplicates(key).reset_index(
+            drop=True)
+        self.key = key
+        self.milestones = list(milestones)
+        self.keys = self.df_project[key].tolist()
+        self.positions = dict((k, i) for i, k in enumerate(self.keys))
+        self.sums = np.zeros((len(self.keys), len(self.milestones) + 1),
+                             dtype=np.int64)
+        self.table = None
+        self.table_pager = None
+
+    def get_positions(self, column):
+        """Project positions of a column of keys, adding unknown keys."""
+        if column.dtype.name == 'category':
+            codes = column.cat.codes.values
+            labels = [str(i) for i in column.cat.categories]
+        else:
+            codes, labels = pd.factorize(column.astype(str))
+        for label in labels:
+            if label not in self.positions:
+                self.positions[label] = len(self.keys)
+                self.keys.append(label)
+        lookup = np.array([self.positions[i] for i in labels] + [-1],
+                          dtype=np.int64)
+        return lookup[codes]
+
+    def add(self, df):
+        """Add the rows of df to the totals."""
+        positions = self.get_positions(df[self.key])
+        valid = positions >= 0
+        positions = positions[valid]
+        n = len(self.keys)
+        sums = np.zeros((n, len(self.milestones) + 1), dtype=np.int64)
+        for i, header in enumerate(self.milestones):
+            flags = np.asarray(df[header].values, dtype=bool)[valid]
+            sums[:, i] = np.bincount(positions[flags], minlength=n)
+        sums[:, -1] = np.bincount(positions, minlength=n)
+        self.add_sums(sums)
+
+    def add_sums(self, sums):
+        if len(sums) > len(self.sums):
+            self.sums = np.vstack([self.sums, np.zeros(
+                (len(sums) - len(self.sums), self.sums.shape[1]),
+                dtype=np.int64)])
+        self.sums = self.sums + sums
+        self.build_table()
+
+    def add_totals(self, totals):
+        """Add a frame of per-key sums, with a 'rows' column."""
+        positions = self.get_positions(totals[self.key])
+        sums = np.zeros((len(self.keys), len(self.milestones) + 1),
+                        dtype=np.int64)
+        np.add.at(sums, positions, totals[self.milestones + ['rows']].values)
+        self.add_sums(sums)
+
+    def extend(self, delta):
+        """Return a rollup with the rows of the delta frame added in."""
+        rollup = copy.copy(self)
+        rollup.keys = list(self.keys)
+        rollup.positions = dict(self.positions)
+        rollup.add(delta)
+        return rollup
+
+    def build_table(self):
+        table = pd.DataFrame({self.key: self.keys}).merge(
+            self.df_project, on=self.key, how='left')
+        rows = self.sums[:, -1]
+        table['Samples'] = rows
+        for i, header in enumerate(self.milestones):
+            share = np.divide(100.0 * self.sums[:, i], rows, out=np.zeros(
+                len(rows)), where=rows > 0)
+            table[header + ' %'] = share.round(1)
+        self.table = table
+        self.table_pager = TablePager(table)
+
+    @property
+    def columns(self):
+        return [str(i) for i in self.table.columns]
+
+    def get_page(self, keys, page_current, page_size, sort_by,
+                 filter_query):
+        """A page of the projects among keys (all if empty)."""
+        mask = None
+        if keys:
+            mask = self.table[self.key].isin(
+                set(str(i) for i in keys)).values
+        return self.table_pager.get_page(mask, page_current, page_size,
+                                         sort_by, filter_query)
@@ -0,0 +1,157 @@
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+def hash_rows(df):
+    return pd.util.hash_pandas_object(df, index=False).values
+
+
+class Snapshot(object):
+    """One version of a loaded frame and the indexes built over it.
+
+    Callbacks read Dataset.current once and use that snapshot throughout,
+    so a reload never changes the data under a request in flight.
+    signature holds the (path, size, mtime) of the files it was read from.
+    """
+
+    def __init__(self, df, version, signature=()):
+        self.df = df
+        self.version = version
+        self.signature = signature
+        self.row_hashes = None
+
+    def get_row_hashes(self):
+        if self.row_hashes is None:
+            self.row_hashes = hash_rows(self.df)
+        return self.row_hashes
+
+    def is_append_of(self, previous):
+        size = len(previous.df)
+        if len(self.df) <= size or list(self.df.columns) != list(
+                previous.df.columns):
+            return False
+        return np.array_equal(self.get_row_hashes()[:size],
+                              previous.get_row_hashes())
+
+
+class Dataset(object):
+    """Reloads a frame when its source files change and swaps it in.
+
+    build(snapshot) fills a new snapshot from scratch. When the new file
+    only appends rows to the previous one, extend(snapshot, previous) is
+    called instead so the indexes absorb just the new rows. Listeners are
+    called with (snapshot, previous) after every swap.
+
+    The watcher thread is started by watch(). Under a pre-fork server
+    the workers do not watch; the master reloads and forks new workers
+    instead (see watch_changes and gunicorn.conf.py).
+    """
+
+    instances = []
+
+    def __init__(self, paths, load, build, extend=None, interval=10):
+        self.paths = paths
+        self.load = load
+        self.build = build
+        self.extend = extend
+        self.interval = interval
+        self.listeners = []
+        self.lock = threading.Lock()
+        self.thread = None
+        self.signature = self.get_signature()
+        self.current = self.get_snapshot(load(), None, self.signature)
+        Dataset.instances.append(self)
+
+    def get_paths(self):
+        if callable(self.paths):
+            return self.paths()
+        return list(self.paths)
+
+    def get_signature(self):
+        signature = []
+        for path in self.get_paths():
+            stat = os.stat(path)
+            signature.append((path, stat.st_size, stat.st_mtime))
+        return tuple(signature)
+
+    def get_snapshot(self, df, previous, signature=()):
+        version = 1 if previous is None else previous.version + 1
+        snapshot = Snapshot(df, version, signature)
+        if (previous is not None and self.extend is not None and
+                snapshot.is_append_of(previous)):
+            self.extend(snapshot, previous)
+        else:
+            self.build(snapshot)
+        if self.extend is not None:
+            snapshot.get_row_hashes()
+        return snapshot
+
+    def reload(self):
+        with self.lock:
+            signature = self.get_signature()
+            if signature == self.signature:
+                return False
+            previous = self.current
+            self.current = self.get_snapshot(self.load(), previous,
+                                             signature)
+            self.signature = signature
+        logger.info('loaded %s as version %d',
+                    ', '.join(i[0] for i in signature), self.current.version)
+        for listener in self.listeners:
+            listener(self.current, previous)
+        return True
+
+    def is_changed(self):
+        return self.get_signature() != self.signature
+
+    def watch(self):
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self.run)
+            self.thread.daemon = True
+            self.thread.start()
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.reload()
+            except Exception:
+                # Most likely a file caught mid-write; retry next round.
+                logger.exception('reloading %s failed', self.get_paths())
+
+
+def watch_changes(datasets, on_change, interval=10):
+    """Call on_change() from a thread when the files of datasets change.
+
+    Only the file signatures are checked here, so the thread takes no
+    lock a forked child could inherit; reloading is left to on_change.
+    A change is reported once the files have been still for an interval,
+    rather than once per write to a file being copied in. Files are
+    compared with what the datasets last loaded, so a reload that failed
+    is asked for again the next round.
+    """
+    def run():
+        last = None
+        while True:
+            time.sleep(interval)
+            try:
+                current = [i.get_signature() for i in datasets]
+            except (OSError, ValueError):
+                # A file being replaced; look again next round.
+                continue
+            if current != [i.signature for i in datasets] and (
+                    current == last):
+                on_change()
+            last = current
+
+    thread = threading.Thread(target=run)
+    thread.daemon = True
+    thread.start()
+    return thread
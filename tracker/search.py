@@ -0,0 +1,79 @@
+import bisect
+
+import numpy as np
+
+
+def get_grams(text, n=3):
+    return set(text[i:i + n] for i in range(len(text) - n + 1))
+
+
+class OptionIndex(object):
+    """Typeahead search over the options of one dropdown.
+
+    Labels are kept sorted case-folded for prefix lookups, and every
+    trigram maps to the labels containing it, so substring queries only
+    check the labels sharing all of the query's trigrams. Queries shorter
+    than a trigram scan the labels in one vectorized pass. Matches are
+    ranked prefix matches first, then by row count; labels counting no
+    rows are left out. Callers may pass counts of their own, such as
+    facet counts under the current selection.
+    """
+
+    def __init__(self, labels, counts):
+        self.labels = list(labels)
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.ids = dict((label, i) for i, label in enumerate(self.labels))
+        self.folded = [i.casefold() for i in self.labels]
+        self.order = sorted(range(len(self.labels)),
+                            key=self.folded.__getitem__)
+        self.sorted = [self.folded[i] for i in self.order]
+        self.array = np.array(self.folded, dtype=np.str_)
+        grams = {}
+        for i, text in enumerate(self.folded):
+            for gram in get_grams(text):
+                grams.setdefault(gram, []).append(i)
+        self.grams = dict((gram, np.array(ids, dtype=np.int32))
+                          for gram, ids in grams.items())
+
+    def __len__(self):
+        return len(self.labels)
+
+    def get_count(self, label, counts=None):
+        counts = self.counts if counts is None else counts
+        i = self.ids.get(label)
+        return 0 if i is None else int(counts[i])
+
+    def get_prefixed(self, query):
+        start = bisect.bisect_left(self.sorted, query)
+        stop = bisect.bisect_left(self.sorted, query + u'\U0010ffff')
+        return np.array(self.order[start:stop], dtype=np.int64)
+
+    def get_containing(self, query):
+        if len(query) < 3:
+            return np.flatnonzero(np.char.find(self.array, query) >= 0)
+        ids = None
+        for gram in get_grams(query):
+            if gram not in self.grams:
+                return np.array([], dtype=np.int64)
+            posting = self.grams[gram]
+            ids = posting if ids is None else np.intersect1d(
+                ids, posting, assume_unique=True)
+        return np.array([i for i in ids if query in self.folded[i]],
+                        dtype=np.int64)
+
+    def search(self, query='', limit=50, counts=None):
+        """Return (label, row count) of the best matches for query."""
+        counts = self.counts if counts is None else np.asarray(counts)
+        query = (query or '').strip().casefold()
+        if not query:
+            ids = np.arange(len(self.labels))
+            prefixed = np.zeros(len(ids), dtype=bool)
+        else:
+            prefixed_ids = self.get_prefixed(query)
+            ids = np.union1d(prefixed_ids, self.get_containing(query))
+            prefixed = np.isin(ids, prefixed_ids)
+        found = counts[ids] > 0
+        ids = ids[found]
+        prefixed = prefixed[found]
+        order = np.lexsort((ids, -counts[ids], ~prefixed))[:limit]
+        return [(self.labels[i], int(counts[i])) for i in ids[order]]
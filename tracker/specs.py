@@ -0,0 +1,44 @@
+milestones = ['Sample Shipped', 'Sample Sequenced', 'DRC Received',
+              'Available on Cavatica', 'Genomics Data Harmonized',
+              'Phenotype Data Harmonized']
+
+sample_filters = [('Title', 'title', 'col-sm-12'),
+                  ('Year', 'year', 'col-sm-2'),
+                  ('Contact PI', 'pi', 'col-sm-4'),
+                  ('Institution Name', 'inst', 'col-sm-6')]
+
+kf_tracker = dict(
+    name='kf-tracker',
+    title='dev-kf-tracker',
+    heading='Gabriella Miller Kids First Data Tracker',
+    logo='logo.png',
+    source='data/sample-random.csv',
+    filters=sample_filters,
+    milestones=milestones,
+    search=['Title', 'Contact PI', 'Institution Name'],
+    trend=True,
+    projects=dict(source='data/project.csv', key='Title'),
+    widget='pie',
+    export='kf-sample-stats.csv')
+
+progress_bar = dict(kf_tracker, name='progress-bar', widget='bar')
+
+cbttc_ngs = dict(
+    name='cbttc-ngs',
+    title='cbttc-ngs-data',
+    heading='CBTTC Available Genomic Data',
+    logo='CBTTC-logo.png',
+    source='data/*-manifest.csv',
+    merge='id',
+    filters=[('disease_type', 'disease_type', 'col-sm-12'),
+             ('experimental_strategy', 'experimental_strategy', 'col-sm-6'),
+             ('sample_type', 'sample_type', 'col-sm-6'),
+             ('gender', 'gender', 'col-sm-4'),
+             ('ethnicity', 'ethnicity', 'col-sm-4'),
+             ('race', 'race', 'col-sm-4')],
+    distinct=['case_id', 'sample_id'],
+    search=['disease_type'],
+    widget='distinct',
+    export='cbttc-ngs-data.csv')
+
+specs = [kf_tracker, progress_bar, cbttc_ngs]
@@ -0,0 +1,329 @@
+import csv
+import glob
+import io
+import math
+import os
+import sqlite3
+import threading
+from urllib.parse import quote as quote_url
+
+import pandas as pd
+
+from .index import get_faceted
+from .metrics import phase
+from .search import OptionIndex
+from .store import get_cache_path
+from .table import parse_filter_query
+
+table = 'samples'
+operators = {'ge': '>=', 'le': '<=', 'lt': '<', 'gt': '>', 'ne': '!=',
+             'eq': '='}
+
+
+def quote(name):
+    return '"{}"'.format(name.replace('"', '""'))
+
+
+def connect(path, **kwargs):
+    """A read-only connection; a missing file raises, not made empty."""
+    uri = 'file:{}?mode=ro'.format(quote_url(os.path.abspath(path)))
+    return sqlite3.connect(uri, uri=True, **kwargs)
+
+
+def remove_stale(db_path, keep=2):
+    """Remove all but the keep newest databases of db_path's name.
+
+    The previous version is kept, as its snapshot may still be serving
+    requests or queued export jobs that open new connections to it.
+    """
+    cache_dir = os.path.dirname(db_path)
+    name = os.path.basename(db_path).rsplit('.', 2)[0]
+    paths = []
+    for path in glob.glob(os.path.join(cache_dir, name + '.*.sqlite')):
+        try:
+            paths.append((os.path.getmtime(path), path))
+        except OSError:
+            pass
+    for _, path in sorted(paths, reverse=True)[keep:]:
+        if path != db_path:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def ingest(path, filters=(), flags=(), distinct=(), cache_dir=None,
+           chunk_size=100000):
+    """Copy a CSV into an indexed SQLite file next to the feather cache.
+
+    The file is keyed like the feather cache, on the CSV's path, size and
+    mtime, so it is built once per version of the CSV.
+    """
+    schema = (tuple(filters), tuple(flags), tuple(distinct))
+    db_path = get_cache_path(path, cache_dir, schema, ext='sqlite')
+    if os.path.exists(db_path):
+        return db_path
+    chunks = pd.read_csv(path, chunksize=chunk_size,
+                         dtype=dict((i, str) for i in filters))
+    write_database(chunks, db_path, filters, flags, distinct)
+    return db_path
+
+
+def write_database(chunks, db_path, filters=(), flags=(), distinct=()):
+    """Write frame chunks to an indexed SQLite file at db_path.
+
+    Filter columns are stored as text, milestone flags as 0/1, and every
+    filter and distinct column gets an index. Older files of the same
+    name with another key are removed, but for the previous one.
+    """
+    cache_dir = os.path.dirname(db_path)
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+    tmp_path = '{}.{}.tmp'.format(db_path, os.getpid())
+    con = sqlite3.connect(tmp_path)
+    try:
+        con.execute('PRAGMA journal_mode=OFF')
+        con.execute('PRAGMA synchronous=OFF')
+        for chunk in chunks:
+            for header in filters:
+                column = chunk[header]
+                chunk[header] = column.where(column.isnull(),
+                                             column.astype(str))
+            for header in flags:
+                chunk[header] = chunk[header].fillna(0).astype(bool).astype(
+                    int)
+            chunk.to_sql(table, con, if_exists='append', index=False)
+        for i, header in enumerate(list(filters) + list(distinct)):
+            con.execute('CREATE INDEX {} ON {} ({})'.format(
+                quote('{}_{}'.format(table, i)), table, quote(header)))
+        con.execute('ANALYZE')
+        con.commit()
+    finally:
+        con.close()
+    os.rename(tmp_path, db_path)
+    remove_stale(db_path)
+
+
+class SQLiteBackend(object):
+    """Answers dashboard queries with SQL over an ingested SQLite file.
+
+    Same interface as FrameBackend. Only the dropdown options and totals
+    are held in memory; masks become WHERE clauses on indexed columns,
+    and pages and exports are read from cursors. Each thread (and each
+    forked worker) opens its own connection.
+    """
+
+    def __init__(self, path, key, filters, milestones=(), distinct=()):
+        self.path = path
+        self.key = key
+        self.filters = list(filters)
+        self.milestones = list(milestones)
+        self.distinct = list(distinct)
+        self.local = threading.local()
+        info = self.execute(
+            'PRAGMA table_info({})'.format(table)).fetchall()
+        self.types = dict((row[1], (row[2] or '').upper()) for row in info)
+        self.columns = [row[1] for row in info]
+        self.options = {}
+        self.option_indexes = {}
+        for header in self.filters:
+            rows = self.execute(
+                'SELECT {0}, COUNT(*) FROM {1} WHERE {0} IS NOT NULL '
+                'GROUP BY {0} ORDER BY {0}'.format(
+                    quote(header), table)).fetchall()
+            self.options[header] = [
+                {'label': row[0], 'value': row[0]} for row in rows]
+            self.option_indexes[header] = OptionIndex(
+                [row[0] for row in rows], [row[1] for row in rows])
+        self.distinct_totals = None
+
+    def connect(self):
+        pid = os.getpid()
+        if getattr(self.local, 'pid', None) != pid:
+            self.local.con = connect(self.path)
+            self.local.pid = pid
+        return self.local.con
+
+    def execute(self, sql, params=()):
+        return self.connect().execute(sql, params)
+
+    def is_numeric(self, header):
+        return self.types.get(header) in ('INTEGER', 'REAL')
+
+    def get_where(self, selection, filter_query=''):
+        clauses = []
+        params = []
+        for header in self.filters:
+            values = selection.get(header)
+            if not values:
+                continue
+            values = sorted(set(str(i) for i in values))
+            clauses.append('{} IN ({})'.format(
+                quote(header), ', '.join('?' * len(values))))
+            params.extend(values)
+        for name, op, value in parse_filter_query(filter_query):
+            if name not in self.types:
+                continue
+            if op == 'contains':
+                value = str(value).replace('\\', '\\\\').replace(
+                    '%', '\\%').replace('_', '\\_')
+                clauses.append("{} LIKE ? ESCAPE '\\'".format(quote(name)))
+                params.append('%{}%'.format(value))
+                continue
+            column = quote(name)
+            if not self.is_numeric(name):
+                if not isinstance(value, float):
+                    value = str(value)
+                elif op in ('eq', 'ne'):
+                    value = str(value).rstrip('0').rstrip('.')
+                else:
+                    # Numbers kept as text, e.g. Year, compare as numbers.
+                    column = 'CAST({} AS REAL)'.format(column)
+            clauses.append('{} {} ?'.format(column, operators[op]))
+            params.append(value)
+        if not clauses:
+            return '', params
+        return ' WHERE ' + ' AND '.join(clauses), params
+
+    def get_options(self, header):
+        return self.options[header]
+
+    def search_options(self, header, query='', limit=50, counts=None):
+        return self.option_indexes[header].search(query, limit, counts)
+
+    def get_option_count(self, header, value, counts=None):
+        return self.option_indexes[header].get_count(str(value), counts)
+
+    def get_facet_counts(self, selection, headers=None):
+        """Per-option row counts of the dropdowns, given the others.
+
+        One statement: a GROUP BY per dropdown in headers (default all)
+        that another one filters, each filtered by the selections of the
+        other dropdowns, joined with UNION ALL.
+        """
+        facets = dict((header, self.option_indexes[header].counts.tolist())
+                      for header in headers or self.filters)
+        faceted = get_faceted(self.filters, selection, headers)
+        if not faceted:
+            return facets
+        selects = []
+        params = []
+        for header in faceted:
+            others = dict((k, v) for k, v in selection.items() if k != header)
+            where, where_params = self.get_where(others)
+            selects.append('SELECT {0}, {1}, COUNT(*) FROM {2}{3} '
+                           'GROUP BY {1}'.format(
+                               self.filters.index(header), quote(header),
+                               table, where))
+            params.extend(where_params)
+        for header in faceted:
+            facets[header] = [0] * len(self.options[header])
+        with phase('facets'):
+            rows = self.execute(' UNION ALL '.join(selects), params)
+            for i, label, count in rows:
+                header = self.filters[i]
+                position = self.option_indexes[header].ids.get(label)
+                if position is not None:
+                    facets[header][position] = count
+        return facets
+
+    def get_milestone_counts(self, selection):
+        where, params = self.get_where(selection)
+        sql = 'SELECT COUNT(*){} FROM {}{}'.format(
+            ''.join(', TOTAL({})'.format(quote(i)) for i in self.milestones),
+            table, where)
+        with phase('aggregate'):
+            row = self.execute(sql, params).fetchone()
+        rows = row[0]
+        return dict((header, (int(yes), rows - int(yes)))
+                    for header, yes in zip(self.milestones, row[1:]))
+
+    def get_milestone_totals(self, header):
+        """Milestone sums and rows per value of one column."""
+        sums = ''.join(', TOTAL({})'.format(quote(i))
+                       for i in self.milestones)
+        sql = ('SELECT {0}{1}, COUNT(*) FROM {2} WHERE {0} IS NOT NULL '
+               'GROUP BY {0}'.format(quote(header), sums, table))
+        totals = pd.read_sql_query(sql, self.connect())
+        totals.columns = [header] + self.milestones + ['rows']
+        return totals
+
+    def get_milestone_cells(self):
+        """Milestone sums and rows per combination of dropdown values."""
+        dims = ', '.join(quote(i) for i in self.filters)
+        sql = 'SELECT {}{}, COUNT(*) FROM {} GROUP BY {}'.format(
+            dims, ''.join(', TOTAL({})'.format(quote(i))
+                          for i in self.milestones), table, dims)
+        cells = pd.read_sql_query(sql, self.connect())
+        cells.columns = self.filters + self.milestones + ['rows']
+        return cells
+
+    def get_distinct_counts(self, selection):
+        where, params = self.get_where(selection)
+        sql = 'SELECT {} FROM {}'.format(', '.join(
+            'COUNT(DISTINCT {})'.format(quote(i)) for i in self.distinct),
+            table)
+        with phase('aggregate'):
+            if self.distinct_totals is None:
+                self.distinct_totals = self.execute(sql).fetchone()
+            if not where:
+                return dict(zip(self.distinct, zip(
+                    self.distinct_totals, self.distinct_totals)))
+            query = self.execute(sql + where, params).fetchone()
+        return dict(zip(self.distinct, zip(query, self.distinct_totals)))
+
+    def get_page(self, selection, page_current, page_size, sort_by,
+                 filter_query):
+        where, params = self.get_where(selection, filter_query)
+        with phase('page'):
+            rows = self.execute('SELECT COUNT(*) FROM {}{}'.format(
+                table, where), params).fetchone()[0]
+        page_count = max(1, int(math.ceil(rows / float(page_size))))
+        start = min(page_current or 0, page_count - 1) * page_size
+        order = 'rowid'
+        if sort_by:
+            column = quote(sort_by[0]['column_id'])
+            direction = ' DESC' if sort_by[0]['direction'] == 'desc' else ''
+            order = '{0} IS NULL, {0}{1}, rowid{1}'.format(column, direction)
+        sql = 'SELECT * FROM {}{} ORDER BY {} LIMIT ? OFFSET ?'.format(
+            table, where, order)
+        with phase('serialize'):
+            cursor = self.execute(sql, params + [page_size, start])
+            names = [i[0] for i in cursor.description]
+            return [dict(zip(names, row))
+                    for row in cursor.fetchmany(page_size)], page_count
+
+    def get_count(self, selection):
+        where, params = self.get_where(selection)
+        return self.execute('SELECT COUNT(*) FROM {}{}'.format(
+            table, where), params).fetchone()[0]
+
+    def select(self, selection):
+        where, params = self.get_where(selection)
+        return pd.read_sql_query('SELECT * FROM {}{} ORDER BY rowid'.format(
+            table, where), self.connect(), params=params)
+
+    def iter_csv(self, selection, chunk_size=10000, counts=False):
+        where, params = self.get_where(selection)
+        # A connection of its own, as the response is streamed after the
+        # request thread may have moved on to other queries.
+        con = connect(self.path, check_same_thread=False)
+        try:
+            cursor = con.execute('SELECT * FROM {}{} ORDER BY rowid'.format(
+                table, where), params)
+            buf = io.StringIO()
+            writer = csv.writer(buf, lineterminator='\n')
+            writer.writerow([i[0] for i in cursor.description])
+            yield (buf.getvalue(), 0) if counts else buf.getvalue()
+            while True:
+                with phase('csv', 'export'):
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    buf.seek(0)
+                    buf.truncate()
+                    writer.writerows(rows)
+                    text = buf.getvalue()
+                yield (text, len(rows)) if counts else text
+        finally:
+            con.close()
@@ -0,0 +1,94 @@
+import glob
+import hashlib
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow.feather as feather
+except ImportError:
+    feather = None
+
+
+def get_cache_path(path, cache_dir=None, schema=(), ext='feather'):
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(path), '.cache')
+    stat = os.stat(path)
+    key = '{}:{}:{!r}:{!r}'.format(os.path.abspath(path), stat.st_size,
+                                   stat.st_mtime, schema)
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+    name = os.path.basename(path)
+    return os.path.join(cache_dir, '{}.{}.{}'.format(name, digest, ext))
+
+
+def replace_cache(cache_path, write):
+    """Make cache_path with write(tmp_path), then drop older versions."""
+    cache_dir = os.path.dirname(cache_path)
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+    name = os.path.basename(cache_path).rsplit('.', 2)[0]
+    ext = cache_path.rsplit('.', 1)[1]
+    stale = glob.glob(os.path.join(cache_dir, '{}.*.{}'.format(name, ext)))
+    tmp_path = '{}.{}.tmp'.format(cache_path, os.getpid())
+    try:
+        write(tmp_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.rename(tmp_path, cache_path)
+    for i in stale:
+        if i != cache_path:
+            os.remove(i)
+
+
+def write_cache(df, cache_path):
+    # Uncompressed so later loads can memory-map the file.
+    replace_cache(cache_path, lambda tmp_path: feather.write_feather(
+        df, tmp_path, compression='uncompressed'))
+
+
+def read_cache(cache_path):
+    table = feather.read_table(cache_path, memory_map=True)
+    return table.to_pandas(split_blocks=True)
+
+
+def load_cached(cache_path, build):
+    """The frame cached at cache_path, or build() written there first."""
+    if os.path.exists(cache_path):
+        return read_cache(cache_path)
+    df = build()
+    try:
+        write_cache(df, cache_path)
+    except (OSError, ValueError, TypeError):
+        pass
+    return df
+
+
+def compact(df, categories=(), flags=()):
+    """Dictionary-encode the filter columns and store flags as booleans.
+
+    Categories are sorted, so the label of a code does not depend on row
+    order. Missing milestone flags count as not done.
+    """
+    for header in categories:
+        values = df[header].dropna().unique()
+        df[header] = pd.Categorical(df[header], categories=sorted(values))
+    for header in flags:
+        df[header] = df[header].fillna(0).astype(bool)
+    return df
+
+
+def load_csv(path, categories=(), flags=(), cache_dir=None, **kwargs):
+    """Read a CSV through a columnar cache keyed on the file's mtime.
+
+    The first load parses and compacts the CSV and writes it out as
+    Feather; later loads memory-map that file, so worker processes share
+    its pages. Without pyarrow this is plain pd.read_csv plus compact.
+    """
+    if feather is None:
+        return compact(pd.read_csv(path, **kwargs), categories, flags)
+    schema = (tuple(categories), tuple(flags))
+    return load_cached(
+        get_cache_path(path, cache_dir, schema),
+        lambda: compact(pd.read_csv(path, **kwargs), categories, flags))
@@ -0,0 +1,157 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from .metrics import phase
+
+operators = [['ge ', '>='], ['le ', '<='], ['lt ', '<'], ['gt ', '>'],
+             ['ne ', '!='], ['eq ', '='], ['contains ']]
+
+
+def split_filter_part(filter_part):
+    for operator_type in operators:
+        for operator in operator_type:
+            if operator in filter_part:
+                name_part, value_part = filter_part.split(operator, 1)
+                name = name_part[name_part.find('{') + 1:name_part.rfind('}')]
+                value_part = value_part.strip()
+                v0 = value_part[:1]
+                if v0 and v0 == value_part[-1] and v0 in ("'", '"', '`'):
+                    value = value_part[1:-1].replace('\\' + v0, v0)
+                else:
+                    try:
+                        value = float(value_part)
+                    except ValueError:
+                        value = value_part
+                return name, operator_type[0].strip(), value
+    return None, None, None
+
+
+def parse_filter_query(filter_query):
+    if not filter_query:
+        return []
+    parts = [split_filter_part(i) for i in filter_query.split(' && ')]
+    return [i for i in parts if i[0] is not None]
+
+
+def get_records(df, flags=()):
+    """Row dicts built from whole columns, with missing values as None.
+
+    The values are plain Python objects and contain no NaN, so Dash's
+    encoder can skip its decode/re-encode pass for strict JSON. Flags,
+    stored as booleans, are given as 0/1 like in the source CSV.
+    """
+    names = [str(i) for i in df.columns]
+    columns = []
+    for name in df.columns:
+        if name in flags:
+            columns.append(np.asarray(df[name].values, dtype=int).tolist())
+            continue
+        values = np.array(df[name].values, dtype=object)
+        missing = pd.isnull(values)
+        if missing.any():
+            values[missing] = None
+        columns.append(values.tolist())
+    return [dict(zip(names, row)) for row in zip(*columns)]
+
+
+def get_sort_order(values):
+    """(stable row order of values with missing ones last, valid count)."""
+    codes, uniques = pd.factorize(values, sort=True)
+    n_valid = int((codes >= 0).sum())
+    codes[codes < 0] = len(uniques)
+    return np.argsort(codes, kind='stable'), n_valid
+
+
+class TablePager(object):
+    """Serves DataTable pages from per-column sort orders of a frame.
+
+    Sort orders are computed by build_orders, or else the first time a
+    column is sorted on, and then reused, so a page request costs one
+    pass over the row mask plus the page itself, whatever the size of
+    the filtered set. extend merges appended rows into the orders.
+    """
+
+    def __init__(self, df, flags=()):
+        self.df = df
+        self.flags = list(flags)
+        self.orders = {}
+
+    def build_orders(self):
+        """Sort on every column now, e.g. before the workers fork."""
+        for column in self.df.columns:
+            self.get_order(column)
+
+    def extend(self, df):
+        """Return a pager over df, whose leading rows are this one's."""
+        pager = TablePager(df, self.flags)
+        size = len(self.df)
+        for column, (order, n_valid) in self.orders.items():
+            tail = df[column].values[size:]
+            tail_order, tail_valid = get_sort_order(tail)
+            old = np.asarray(self.df[column].values)[order[:n_valid]]
+            new = np.asarray(tail)[tail_order[:tail_valid]]
+            try:
+                # Right of equal values, as the new rows come after.
+                at = np.searchsorted(old, new, side='right')
+            except TypeError:
+                pager.get_order(column)
+                continue
+            valid = np.insert(order[:n_valid], at,
+                              tail_order[:tail_valid] + size)
+            pager.orders[column] = (np.concatenate(
+                [valid, order[n_valid:], tail_order[tail_valid:] + size]),
+                n_valid + tail_valid)
+        return pager
+
+    def get_order(self, column, descending=False):
+        if column not in self.orders:
+            self.orders[column] = get_sort_order(self.df[column].values)
+        order, n_valid = self.orders[column]
+        if descending:
+            return np.concatenate([order[:n_valid][::-1], order[n_valid:]])
+        return order
+
+    def get_filter_mask(self, name, op, value):
+        column = self.df[name]
+        if column.dtype.name == 'category':
+            column = column.astype(column.cat.categories.dtype)
+        if op == 'contains':
+            return column.astype(str).str.contains(
+                str(value), case=False, regex=False).values
+        if isinstance(value, float) and not pd.api.types.is_numeric_dtype(
+                column):
+            value = str(value).rstrip('0').rstrip('.')
+        if op in ('eq', 'ne') and not pd.api.types.is_numeric_dtype(column):
+            column = column.astype(str)
+        mask = {'ge': column.__ge__, 'le': column.__le__,
+                'lt': column.__lt__, 'gt': column.__gt__,
+                'ne': column.__ne__, 'eq': column.__eq__}[op](value)
+        return np.asarray(mask, dtype=bool)
+
+    def get_rows(self, mask, sort_by, filter_query):
+        keep = mask
+        for name, op, value in parse_filter_query(filter_query):
+            if name not in self.df.columns:
+                continue
+            col_mask = self.get_filter_mask(name, op, value)
+            keep = col_mask if keep is None else keep & col_mask
+        if sort_by:
+            order = self.get_order(sort_by[0]['column_id'],
+                                   sort_by[0]['direction'] == 'desc')
+            if keep is None:
+                return order
+            return order[keep[order]]
+        if keep is None:
+            return np.arange(len(self.df))
+        return np.flatnonzero(keep)
+
+    def get_page(self, mask, page_current, page_size, sort_by, filter_query):
+        with phase('page'):
+            rows = self.get_rows(mask, sort_by, filter_query)
+        page_count = max(1, int(math.ceil(len(rows) / float(page_size))))
+        start = min(page_current or 0, page_count - 1) * page_size
+        with phase('serialize'):
+            page = self.df.iloc[rows[start:start + page_size]]
+            return get_records(page, self.flags), page_count
@@ -0,0 +1,214 @@
+import datetime
+
+import dash_core_components as dcc
+import dash_html_components as html
+from dash.dependencies import Output
+
+layout_fig = {'height': '220px'}
+
+
+def get_fig_dict(counts, header):
+    yes, no = counts[header]
+    if yes + no == 0:
+        no = 1
+    fy = float(yes)
+    fn = float(no)
+    pct = "{:.2%}<br />".format(float(fy/(fy+fn)))
+    header = header.replace('Data ', 'Data<br />')
+    data = dict(
+        values=[yes, no],
+        labels=['Complete', 'Waiting'],
+        marker=dict(
+            colors=['#009ABA', '#ED309D']
+        ),
+        textposition='none',
+        hole=.95,
+        type='pie'
+    )
+    layout = dict(
+        showlegend=False,
+        height=210,
+        width=150,
+        margin=dict(
+            b=0, l=0, r=0, t=0, pad=0
+        ),
+        annotations=[dict(
+            x=0.5,
+            y=0.5,
+            text=pct+header,
+            showarrow=False
+        )]
+    )
+    return dict(data=[data], layout=layout)
+
+
+def get_trend_fig_dict(trend, headers, start=None, end=None):
+    """Completion of every milestone over time, as steps per version.
+
+    The first version may predate start; it is drawn from start on, and
+    the last one is drawn up to end.
+    """
+    times = [max(t, start) if start else t for t, _ in trend]
+    if trend and end:
+        times.append(end)
+        trend = trend + trend[-1:]
+    x = [datetime.datetime.fromtimestamp(t).isoformat() for t in times]
+    data = []
+    for header in headers:
+        y = []
+        for _, counts in trend:
+            yes, no = counts[header]
+            y.append(round(100.0 * yes / (yes + no), 2) if yes + no else 0)
+        data.append(dict(x=x, y=y, name=header, mode='lines',
+                         line=dict(shape='hv'), type='scatter'))
+    layout = dict(
+        height=260,
+        margin=dict(b=30, l=40, r=10, t=10, pad=0),
+        yaxis=dict(range=[0, 100], ticksuffix='%'),
+        legend=dict(orientation='h'),
+        showlegend=True
+    )
+    return dict(data=data, layout=layout)
+
+
+def get_dcc_graph(id, fig_dict):
+    return dcc.Graph(
+        id=id,
+        figure=fig_dict,
+        config=dict(displayModeBar=False, displaylogo=False)
+    )
+
+
+def get_milestone_bar_props(counts, header):
+    yes, no = counts[header]
+    if yes + no == 0:
+        no = 1
+    fy = float(yes)
+    fn = float(no)
+    pct = "{:.2%}".format(float(fy/(fy+fn)))
+    style = {'width': pct,
+             'height': '20px',
+             'text-align': 'left',
+             'padding-left': '10'}
+    return style, header+': '+pct
+
+
+def get_milestone_bar(counts, header, id):
+    style, text = get_milestone_bar_props(counts, header)
+    html_bar = html.Div(
+        id=id,
+        style=style,
+        children=text,
+        className='progress-bar progress-info'
+    )
+    return html.Div(html_bar, className='progress',
+                    style={'height': '20px', 'margin-top': '0'})
+
+
+def get_distinct_bar_props(counts, header):
+    query, total = counts[header]
+    fy = float(total)
+    fn = float(query)
+    pct = "{:.2%}".format(float(fn/fy))
+    style = {'width': pct,
+             'height': '25px',
+             'font-size': '14'}
+    return style, '{} ({}/{})'.format(pct, query, total)
+
+
+def get_distinct_bar(counts, header, id):
+    style, text = get_distinct_bar_props(counts, header)
+    html_bar = html.Div(
+        id=id,
+        style=style,
+        children=text,
+        className='progress-bar progress-bar-info'
+    )
+    header = html.Div(header.replace('_id', ' number:'))
+    html_bar = html.Div(html_bar, className='progress',
+                        style={'height': '25px', 'margin-top': '0'})
+    return html.Div([header, html_bar])
+
+
+class PieWidget(object):
+    """A donut chart of complete/waiting samples per milestone."""
+
+    counts = 'milestones'
+    beside_filters = False
+
+    def __init__(self, headers):
+        self.headers = list(headers)
+        self.ids = ['pie-{}'.format(i) for i in range(len(self.headers))]
+
+    def get_layout(self, counts):
+        figs = [get_dcc_graph(id, get_fig_dict(counts, header))
+                for id, header in zip(self.ids, self.headers)]
+        return html.Div(
+            [
+                html.Div(i, className='col-lg-2 col-sm-4', style=layout_fig)
+                for i in figs
+            ], className='row'
+        )
+
+    def get_outputs(self):
+        return [Output(i, 'figure') for i in self.ids]
+
+    def get_values(self, counts):
+        return [get_fig_dict(counts, i) for i in self.headers]
+
+
+class BarWidget(object):
+    """A progress bar of complete samples per milestone.
+
+    Updates only set each bar's style and text.
+    """
+
+    counts = 'milestones'
+    beside_filters = False
+
+    def __init__(self, headers):
+        self.headers = list(headers)
+        self.ids = ['bar-{}'.format(i) for i in range(len(self.headers))]
+
+    def get_layout(self, counts):
+        return html.Div(
+            [get_milestone_bar(counts, header, id)
+             for id, header in zip(self.ids, self.headers)],
+            className='row', id='progress-bar', style={'margin-top': '35'}
+        )
+
+    def get_outputs(self):
+        return [Output(id, prop) for id in self.ids
+                for prop in ('style', 'children')]
+
+    def get_values(self, counts):
+        return [value for header in self.headers
+                for value in get_milestone_bar_props(counts, header)]
+
+
+class DistinctWidget(object):
+    """Selected out of total distinct values, e.g. cases and samples."""
+
+    counts = 'distinct'
+    beside_filters = True
+
+    def __init__(self, headers):
+        self.headers = list(headers)
+        self.ids = ['bar-{}'.format(i) for i in range(len(self.headers))]
+
+    def get_layout(self, counts):
+        return html.Div(
+            [get_distinct_bar(counts, header, id)
+             for id, header in zip(self.ids, self.headers)],
+            className='col-sm-6', id='bar')
+
+    def get_outputs(self):
+        return [Output(id, prop) for id in self.ids
+                for prop in ('style', 'children')]
+
+    def get_values(self, counts):
+        return [value for header in self.headers
+                for value in get_distinct_bar_props(counts, header)]
+
+
+widgets = {'pie': PieWidget, 'bar': BarWidget, 'distinct': DistinctWidget}
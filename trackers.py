@@ -0,0 +1,14 @@
+# Every dashboard in tracker/specs.py under its own prefix of one server,
+# e.g. /kf-tracker/ and /cbttc-ngs/:
+#
+#     gunicorn -c gunicorn.conf.py trackers:server
+from tracker.engine import Engine
+from tracker.specs import specs
+
+engine = Engine(specs, mount=True)
+server = engine.server
+
+
+if __name__ == '__main__':
+    engine.watch()
+    server.run(debug=True, host='0.0.0.0', port=8080)